@@ -0,0 +1,103 @@
+# Agregacje dla wykresów liczone po stronie bazy (GROUP BY)
+# Zamiast wczytywać wszystkie wydatki do pandas, pobieramy tylko wyniki - ich liczba
+# zależy od liczby miesięcy i kategorii, a nie od liczby wydatków
+# Agregacje miesięczne czytamy z podsumowania expense_monthly_summary (utrzymywanego przy zapisach)
+# Podsumowanie trzyma id kategorii - nazwy dołączamy jednym JOIN-em z Category
+import sys
+from peewee import Select, SQL, fn
+from models import Expense, Category, ExpenseMonthlySummary, money_sum, money_avg
+from money import to_zloty
+
+Summary = ExpenseMonthlySummary
+
+
+# Lista miesięcy z wydatkami, od najnowszego: ['2024-06', '2024-05', ...]
+def available_months():
+    query = (Summary
+             .select(Summary.year_month)
+             .group_by(Summary.year_month)
+             .order_by(Summary.year_month.desc())
+             .tuples())
+    return [row[0] for row in query]
+
+
+# Suma wydatków w każdym miesiącu i kategorii: [(miesiąc, kategoria, suma), ...] rosnąco po miesiącu
+def monthly_category_totals():
+    query = (Summary
+             .select(Summary.year_month, Category.name, Summary.total)
+             .join(Category)
+             .order_by(Summary.year_month, Category.name)
+             .tuples())
+    return list(query)
+
+
+# Suma wydatków w każdym miesiącu: [(miesiąc, suma), ...] rosnąco po miesiącu
+def monthly_totals():
+    query = (Summary
+             .select(Summary.year_month, money_sum(Summary.total))
+             .group_by(Summary.year_month)
+             .order_by(Summary.year_month)
+             .tuples())
+    return list(query)
+
+
+# Suma wydatków wg kategorii (opcjonalnie tylko w jednym miesiącu 'RRRR-MM'),
+# od największej: [(kategoria, suma), ...]
+def category_totals(month=None):
+    total = money_sum(Summary.total)
+    query = Summary.select(Category.name, total.alias('total')).join(Category)
+    if month is not None:
+        query = query.where(Summary.year_month == month)
+    query = query.group_by(Category.name).order_by(total.desc()).tuples()
+    return list(query)
+
+
+# Średni miesięczny wydatek w każdej kategorii (średnia z miesięcznych sum,
+# liczona po miesiącach, w których kategoria wystąpiła), od największego: [(kategoria, średnia), ...]
+def average_monthly_by_category():
+    average = money_avg(Summary.total)
+    query = (Summary
+             .select(Category.name, average)
+             .join(Category)
+             .group_by(Category.name)
+             .order_by(average.desc())
+             .tuples())
+    return list(query)
+
+
+# Narastająca suma wydatków: [(data, suma od początku do tego dnia), ...] rosnąco po dacie
+# Najpierw sumy dzienne (GROUP BY), potem SUM(...) OVER (ORDER BY date) - jeden punkt na dzień
+# max_points ogranicza liczbę punktów dla długich zakresów: zostawiamy co k-ty dzień (zawsze z ostatnim),
+# a suma narastająca w zostawionych punktach pozostaje dokładna
+def cumulative_totals(max_points=None):
+    rows = cumulative_query(max_points).bind(Expense._meta.database).tuples()
+    # Kolumny z podzapytania nie przechodzą przez konwersję pól - datę i grosze zamieniamy sami
+    return [(Expense.date.python_value(day), to_zloty(total)) for day, total in rows]
+
+
+# Zapytanie dla cumulative_totals (niepodpięte pod bazę): (data, suma narastająca w groszach)
+def cumulative_query(max_points=None):
+    daily = (Expense
+             .select(Expense.date, fn.SUM(Expense.amount).alias('total'))
+             .group_by(Expense.date)
+             .alias('daily'))
+    points = Select([daily], [
+        daily.c.date,
+        fn.SUM(daily.c.total).over(order_by=[daily.c.date]).alias('cumulative'),
+        fn.ROW_NUMBER().over(order_by=[daily.c.date]).alias('row_no'),
+        fn.COUNT(SQL('*')).over().alias('days'),
+    ]).alias('points')
+    query = Select([points], [points.c.date, points.c.cumulative]).order_by(points.c.date)
+    if max_points:
+        # Krok k = ceil(dni / max_points), liczony w bazie na liczbach całkowitych
+        step = (points.c.days + max_points - 1) / max_points
+        query = query.where(fn.MOD(points.c.days - points.c.row_no, step) == 0)
+    return query
+
+
+# Naprawa podsumowania miesięcznego: python analytics.py rebuild
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        print(f"Przeliczono podsumowanie miesięczne: {Summary.rebuild()} wierszy")
+    else:
+        print("Użycie: python analytics.py rebuild")
@@ -1,11 +1,25 @@
 from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+import codecs
+import glob
+import csv
+import hashlib
+import io
+import numpy as np
 import pandas as pd
-from peewee import fn
-from models import Expense, Category
+from peewee import chunked, PostgresqlDatabase
+from models import Expense, Category, CategoryRegistry, ImportManifest, ExpenseMonthlySummary
 from database import db, TEST_MODE
 import os
 import logging
 
+# Blokady doradcze (flock) są dostępne tylko na systemach uniksowych (np. w kontenerze Dockera)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Dodajemy logger
 logger = logging.getLogger(__name__)
 
@@ -51,104 +65,401 @@ else:
     # Jeśli żaden nie istnieje — użyj pierwszego
     CSV_FILE = next((p for p in candidates if p and os.path.isfile(p)), candidates[0])
 
-def ensure_categories(expenses):
-    # Sprawdzamy, czy wszystkie kategorie z Expenses istnieją w tabeli Category
-    # Jeśli brakuje jakiejś kategorii, zostaje ona dodana z domyślnym kolorem
-    existing_categories = {c.name for c in Category.select()}
+# Liczba wierszy zapisywanych jednym zapytaniem INSERT podczas importu
+# Można ją zmienić zmienną środowiskową IMPORT_BATCH_SIZE
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+# Opcjonalna ścieżka raportu odrzuconych wierszy (numer wiersza + powód)
+# Jeśli nie jest ustawiona, raport nie jest zapisywany do pliku
+REJECT_REPORT_FILE = os.getenv("REJECT_REPORT_FILE")
+
+# Liczba wierszy wczytywanych naraz w trybie strumieniowym (import_from_csv(chunksize=...))
+# Pamięć zależy od wielkości porcji, a nie od wielkości pliku
+IMPORT_CHUNKSIZE = int(os.getenv("IMPORT_CHUNKSIZE", "50000"))
+
+# Tryb zapisu kopii po każdej zmianie w aplikacji:
+# "full" - przepisujemy cały plik CSV, "journal" - dopisujemy zmianę do dziennika (JOURNAL_FILE)
+EXPORT_MODE = os.getenv("EXPORT_MODE", "full").lower()
+
+# Kopia w formacie kolumnowym Parquet (export_to_parquet / import_from_parquet)
+PARQUET_FILE = os.getenv("PARQUET_FILE") or os.path.splitext(CSV_FILE)[0] + ".parquet"
+
+# Dziennik zmian (insert/update/delete) dopisywanych w trybie "journal"
+# compact_journal() przenosi zmiany z dziennika do CSV_FILE
+JOURNAL_FILE = os.getenv("JOURNAL_FILE") or os.path.splitext(CSV_FILE)[0] + "_journal.csv"
+JOURNAL_COLUMNS = ["Operacja", "ID", "Kwota", "Kategoria", "Data"]
+
+# Liczba procesów parsujących pliki przy imporcie wielu plików (import_from_directory)
+# 0 = liczba rdzeni procesora
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "0"))
+
+# Liczba bajtów z początku pliku, na podstawie których wykrywamy kodowanie CSV
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Obsługiwane warianty nagłówków (polskie i angielskie)
+POSSIBLE_MAPPINGS = [
+    {"id": "id", "kwota": "amount", "kategoria": "category", "data": "date"},  # polskie
+    {"id": "id", "amount": "amount", "category": "category", "date": "date"}  # angielskie
+]
+
+# Statystyki ostatniego importu (liczba wierszy, zaimportowanych, odrzuconych i powody)
+LAST_IMPORT_STATS = {}
+
+def ensure_categories(names):
+    # Wydatki trzymają id kategorii, więc kategorie z pliku muszą istnieć przed zapisem
+    # Zwracamy słownik nazwa -> id (jedno zapytanie); brakujące kategorie dodajemy jednym INSERT-em
+    return Category.ids_for_names(names)
+
+def upsert_expenses(rows, batch_size=None):
+    # Zapisujemy wydatki paczkami jednym zapytaniem na paczkę:
+    # INSERT ... ON CONFLICT (id) DO UPDATE (Postgres i SQLite >= 3.24 mają tę samą składnię)
+    # rows to lista słowników z kluczami id, amount, category (nazwa), date
+    # Zwracamy liczbę zapisanych wierszy (tak samo liczoną jak przy zapisie wiersz po wierszu)
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    written = 0
+
+    # Nazwy kategorii zamieniamy na id raz dla wszystkich wierszy
+    category_ids = ensure_categories(row["category"] for row in rows)
+    rows = [{**row, "category": category_ids[row["category"]]} for row in rows]
+
+    for batch in chunked(rows, batch_size):
+        # To samo id może wystąpić w pliku kilka razy - wygrywa ostatni wiersz,
+        # tak jak przy kolejnych save(); Postgres nie pozwala zmienić wiersza dwa razy w jednym INSERT
+        unique_rows = list({row["id"]: row for row in batch}.values())
+        try:
+            with db.atomic():
+                (Expense
+                 .insert_many(unique_rows)
+                 .on_conflict(conflict_target=[Expense.id],
+                              preserve=[Expense.amount, Expense.category, Expense.date])
+                 .execute())
+            written += len(batch)
+        except Exception as e:
+            # Paczka nie przeszła - zapisujemy jej wiersze pojedynczo, żeby pominąć tylko błędne
+            logger.error(f"Błąd zapisu paczki {len(batch)} wierszy, zapisuję pojedynczo: {e}")
+            for row in batch:
+                try:
+                    with db.atomic():
+                        (Expense
+                         .insert(row)
+                         .on_conflict(conflict_target=[Expense.id],
+                                      preserve=[Expense.amount, Expense.category, Expense.date])
+                         .execute())
+                    written += 1
+                except Exception as row_error:
+                    logger.error(f"Błąd przetwarzania wiersza {row}: {row_error}")
+
+    return written
+
+def use_copy():
+    # COPY działa tylko w Postgresie (psycopg2)
+    # W TEST_MODE (SQLite) zostajemy przy zapisie przez pandas/peewee
+    return not TEST_MODE and isinstance(db, PostgresqlDatabase)
+
+# Tabela tymczasowa (na czas połączenia), do której COPY ładuje porcję przed scaleniem z expense
+STAGING_TABLE = "expense_staging"
+
+def copy_expenses(valid):
+    # Ładujemy poprawne wiersze przez COPY ... FROM STDIN do tabeli tymczasowej
+    # i scalamy je z expense jednym INSERT ... ON CONFLICT (id) DO UPDATE
+    # row_no zachowuje kolejność z pliku - przy powtórzonym id wygrywa ostatni wiersz
+    # Kategorie trafiają do tabeli tymczasowej jako nazwy, a id dołączamy przy scalaniu (JOIN z category)
+    # Kwoty ładujemy w złotych jako numeric (dokładnie jak w pliku) i zamieniamy na grosze przy scalaniu -
+    # ROUND na numeric zaokrągla połówki od zera, tak jak to_grosze (1.005 -> 101 groszy)
+    table = Expense._meta.table_name
+    ensure_categories(valid["category"].unique())
+    buffer = io.StringIO()
+    (valid[["id", "amount", "category", "date"]]
+     .assign(row_no=np.arange(len(valid)))
+     .to_csv(buffer, index=False, header=False, columns=["row_no", "id", "amount", "category", "date"]))
+    buffer.seek(0)
+
+    cursor = db.cursor()
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+            row_no bigint, id integer, amount numeric, category varchar(255), date date
+        )""")
+    cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} (row_no, id, amount, category, date) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(f"""
+        INSERT INTO {table} (id, amount, category_id, date)
+        SELECT DISTINCT ON (id) id, amount, category_id, date
+        FROM (SELECT s.row_no, s.id, CAST(ROUND(CAST(s.amount AS NUMERIC) * 100) AS BIGINT) AS amount, c.id AS category_id, s.date
+              FROM {STAGING_TABLE} s JOIN {Category._meta.table_name} c ON c.name = s.category) AS staged
+        ORDER BY id, row_no DESC
+        ON CONFLICT (id) DO UPDATE
+        SET amount = EXCLUDED.amount, category_id = EXCLUDED.category_id, date = EXCLUDED.date""")
+    cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+    return len(valid)
+
+def write_expenses(valid, batch_size=None):
+    # Zapisujemy porcję poprawnych wierszy: w Postgresie przez COPY, w SQLite paczkami insert_many
+    if use_copy():
+        return copy_expenses(valid)
+    return upsert_expenses(valid.to_dict("records"), batch_size=batch_size)
+
+def validate_expenses(df):
+    # Walidujemy całą ramkę naraz (kolumnami) zamiast wiersz po wierszu
+    # Oczekujemy znormalizowanych kolumn: id, amount, category, date
+    # Zwracamy (poprawne wiersze, raport odrzuconych wierszy z kolumnami Wiersz i Powód)
+    ids = pd.to_numeric(df["id"], errors="coerce")
+    amounts = pd.to_numeric(df["amount"], errors="coerce")
+    dates = pd.to_datetime(df["date"].astype(str), errors="coerce")
+
+    # Maski dla poszczególnych powodów odrzucenia
+    missing = df[["amount", "date", "category"]].isna().any(axis=1)
+    invalid_id = ids.isna()
+    invalid_date = dates.isna()
+    invalid_amount = amounts.isna()
+    non_positive = amounts <= 0
+
+    # Każdy wiersz dostaje pierwszy pasujący powód (kolejność jak przy dawnych sprawdzeniach)
+    reasons = np.select(
+        [missing, invalid_id, invalid_date, invalid_amount, non_positive],
+        ["brak danych", "niepoprawne id", "niepoprawna data", "niepoprawna kwota", "kwota niedodatnia"],
+        default=""
+    )
+    rejected = reasons != ""
+
+    # Numer wiersza liczymy tak jak w pliku (1 = nagłówek)
+    rejects = pd.DataFrame({
+        "Wiersz": df.index[rejected] + 2,
+        "Powód": reasons[rejected]
+    })
+
+    accepted = ~rejected
+    valid = pd.DataFrame({
+        "id": ids[accepted].astype("int64"),
+        "amount": amounts[accepted].astype(float),
+        "category": df.loc[accepted, "category"],
+        "date": dates[accepted].dt.date
+    })
+    return valid, rejects
+
+def write_reject_report(rejects, path, append=False):
+    # Zapisujemy raport odrzuconych wierszy jednym zapisem do pliku
+    # W trybie strumieniowym kolejne porcje dopisujemy (bez ponownego nagłówka)
+    rejects.to_csv(path, mode='a' if append else 'w', header=not append, index=False, encoding='utf-8-sig')
+    logger.info(f"Raport odrzuconych wierszy zapisany do: {path}")
+
+def map_columns(columns):
+    # Czyścimy nagłówki kolumn i dopasowujemy je do jednego z wariantów z POSSIBLE_MAPPINGS
+    # Zwracamy słownik {oryginalny nagłówek: nazwa pola} albo None, jeśli żaden wariant nie pasuje
+    cleaned = [str(c).strip().replace('\ufeff', '').lower() for c in columns]
+    for mapping in POSSIBLE_MAPPINGS:
+        if set(mapping.keys()).issubset(set(cleaned)):
+            return {original: mapping.get(name, name) for original, name in zip(columns, cleaned)}
+    return None
+
+def detect_encoding(path, sample_size=ENCODING_SAMPLE_SIZE):
+    # Wykrywamy kodowanie raz, na podstawie BOM i próbki początkowych bajtów (bez parsowania pliku)
+    # BOM UTF-8 -> utf-8-sig, poprawne UTF-8 -> utf-8, w przeciwnym razie latin-1
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False - znak wielobajtowy ucięty na końcu próbki nie jest błędem
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def _import_csv_file(path, encoding, chunksize=None, **import_options):
+    # Jeden odczyt pliku wybranym kodowaniem - całość albo porcjami po chunksize wierszy
+    if chunksize:
+        with open(path, 'rb') as handle:
+            file_size = os.fstat(handle.fileno()).st_size or 1
+            return _import_frames(
+                pd.read_csv(handle, sep=',', encoding=encoding, chunksize=chunksize),
+                position=lambda: min(handle.tell() / file_size, 1.0),
+                **import_options
+            )
+
+    df = pd.read_csv(path, sep=',', encoding=encoding)
+    return _import_frames([df], position=lambda: 1.0, **import_options)
+
+def _import_frames(frames, batch_size=None, reject_report=None, progress_callback=None, position=None):
+    # Importujemy kolejne ramki (cały plik albo porcje) - każda w osobnej transakcji
+    # Nagłówki normalizujemy raz, na pierwszej niepustej ramce
+    # position() zwraca, jaka część pliku została już przeczytana (0..1)
+    mapping = None
+    total_rows = 0
+    imported_count = 0
+    rejected_count = 0
+    reject_reasons = {}
+    report_path = reject_report or REJECT_REPORT_FILE
+    report_started = False
 
-    for e in expenses:
-        if e.category not in existing_categories:
-            # Kolor zostanie przypisany automatycznie
-            Category.create_category(e.category, color=None)
-            existing_categories.add(e.category)
+    try:
+        for df in frames:
+            if df.empty:
+                continue
+
+            if mapping is None:
+                mapping = map_columns(df.columns)
+                if mapping is None:
+                    logger.error(f"Niespodziewane kolumny: {list(df.columns)}")
+                    return 0
+                logger.info(f"Znalezione kolumny: {list(mapping.values())}")
+
+            df = df.rename(columns=mapping)
+            # Numery wierszy liczymy od początku pliku, a nie od początku porcji
+            # (porcje Parquet mają indeks od zera w każdej porcji)
+            df.index = pd.RangeIndex(total_rows, total_rows + len(df))
+            total_rows += len(df)
+
+            valid, rejects = validate_expenses(df)
+
+            if not rejects.empty:
+                rejected_count += len(rejects)
+                for reason, count in rejects["Powód"].value_counts().items():
+                    reject_reasons[reason] = reject_reasons.get(reason, 0) + count
+                if report_path:
+                    write_reject_report(rejects, report_path, append=report_started)
+                    report_started = True
+
+            # Aktualizujemy istniejące wydatki lub tworzymy nowe - paczkami zamiast wiersz po wierszu
+            with db.atomic():
+                imported_count += write_expenses(valid, batch_size=batch_size)
+            # Kategorie dodane w tej transakcji są już zatwierdzone - rejestr wczytujemy od nowa
+            CategoryRegistry.invalidate()
+
+            if progress_callback:
+                progress_callback(total_rows, imported_count, position() if position else None)
+    finally:
+        # Każda porcja jest zatwierdzana osobno, więc także po błędzie w dalszej porcji zapisane już wiersze
+        # muszą trafić do podsumowania miesięcznego (rebuild zmienia też wersję danych) i sekwencji id
+        if imported_count:
+            # Po scaleniu przez COPY ustawiamy sekwencję id jednym krokiem na końcu importu
+            if use_copy():
+                reset_id_sequence()
+            # Import nadpisuje wydatki masowo, więc podsumowanie miesięczne przeliczamy raz, w SQL
+            ExpenseMonthlySummary.rebuild()
+
+    # Dodajemy obsługę pustego pliku
+    if total_rows == 0:
+        logger.info("Plik CSV jest pusty")
+        return 0
 
-def import_from_csv(csv_file=None):
-# Importujemy dane z pliku CSV do bazy
-# Próbujemy odczytać plik na wszelki wypadek w kilku kodowaniach
-# Normalizujemy nazwy kolumn (PL i EN)
-# Tworzymy/aktualizujemy rekordy w bazie
-# Pomijamy błędne lub niekompletne wiersze
+    logger.info(f"Liczba wierszy w CSV: {total_rows}")
 
-    try:
-        path_to_use = csv_file or CSV_FILE
-        logger.info(f"Importuję CSV z: {path_to_use}")
+    # Jedno podsumowanie zamiast ostrzeżenia dla każdego odrzuconego wiersza
+    if rejected_count:
+        logger.warning(f"Pominięto {rejected_count} wierszy: {reject_reasons}")
 
-        # Próba odczytu w różnych kodowaniach
-        try:
-            df = pd.read_csv(path_to_use, sep=',', encoding='utf-8')
-        except Exception:
-            try:
-                df = pd.read_csv(path_to_use, sep=',', encoding='utf-8-sig')
-            except Exception:
-                df = pd.read_csv(path_to_use, sep=',', encoding='latin-1')
-
-        # Dodajemy obsługę pustego pliku
-        if df.empty:
-            logger.info("Plik CSV jest pusty")
-            return 0
+    logger.info(f"Import z CSV zakończony. Zaimportowano {imported_count} rekordów.")
+    LAST_IMPORT_STATS.update({
+        "rows": total_rows,
+        "imported": imported_count,
+        "rejected": rejected_count,
+        "reject_reasons": reject_reasons
+    })
 
-        # Czyścimy nagłówki kolumn
-        df.columns = df.columns.str.strip().str.replace('\ufeff', '').str.lower()
+    return imported_count
 
-        # Dodajemy obsługę różnych wariantów nagłówków
-        possible_mappings = [
-            {"id": "id", "kwota": "amount", "kategoria": "category", "data": "date"},  # polskie
-            {"id": "id", "amount": "amount", "category": "category", "date": "date"}  # angielskie
-        ]
+def file_hash(path):
+    # Liczymy SHA-256 zawartości pliku, czytając go blokami po 1 MB
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-        for mapping in possible_mappings:
-            if set(mapping.keys()).issubset(set(df.columns)):
-                df = df.rename(columns=mapping)
-                break
-        else:
-            logger.error(f"Niespodziewane kolumny: {df.columns}")
-            return 0
+def get_import_manifest(path=None):
+    # Pobieramy manifest importu dla pliku (domyślnie CSV_FILE) lub None
+    try:
+        return ImportManifest.get_or_none(ImportManifest.path == os.path.abspath(path or CSV_FILE))
+    except Exception as e:
+        logger.error(f"Błąd odczytu manifestu importu: {e}")
+        return None
+
+def csv_unchanged(path):
+    # Sprawdzamy, czy plik jest taki sam jak przy ostatnim imporcie
+    # Najpierw tanio: rozmiar i czas modyfikacji; skrót zawartości liczymy tylko, gdy zmienił się sam mtime
+    manifest = get_import_manifest(path)
+    if manifest is None:
+        return False
+
+    stat = os.stat(path)
+    if stat.st_size != manifest.size:
+        return False
+    if stat.st_mtime == manifest.mtime:
+        return True
+    if file_hash(path) != manifest.content_hash:
+        return False
+
+    # Zawartość ta sama (np. plik został tylko dotknięty) - zapamiętujemy nowy mtime
+    manifest.mtime = stat.st_mtime
+    manifest.save()
+    return True
+
+def save_import_manifest(path, imported_count=None):
+    # Zapisujemy rozmiar, mtime i skrót pliku w manifeście
+    # imported_count=None oznacza, że plik zapisała aplikacja (eksport) - data importu zostaje bez zmian
+    try:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        manifest = ImportManifest.get_or_none(ImportManifest.path == path) or ImportManifest(path=path)
+        manifest.size = stat.st_size
+        manifest.mtime = stat.st_mtime
+        manifest.content_hash = file_hash(path)
+        if imported_count is not None:
+            manifest.imported_at = datetime.now()
+            manifest.imported_count = imported_count
+        manifest.save()
+    except Exception as e:
+        logger.error(f"Błąd zapisu manifestu importu: {e}")
 
-        logger.info(f"Znalezione kolumny: {list(df.columns)}")
-        logger.info(f"Liczba wierszy w CSV: {len(df)}")
+def import_from_csv(csv_file=None, batch_size=None, reject_report=None, chunksize=None, progress_callback=None,
+                    skip_unchanged=False):
+# Importujemy dane z pliku CSV do bazy
+# Kodowanie wykrywamy z BOM i próbki początku pliku, a plik parsujemy raz
+# Normalizujemy nazwy kolumn (PL i EN)
+# Walidujemy wszystkie wiersze naraz, błędne lub niekompletne pomijamy
+# Tworzymy/aktualizujemy rekordy w bazie paczkami (batch_size wierszy na zapytanie)
+# Odrzucone wiersze trafiają do raportu (reject_report lub REJECT_REPORT_FILE)
+# Z chunksize plik jest czytany strumieniowo porcjami po chunksize wierszy,
+# a progress_callback(wiersze, zaimportowane, postęp 0..1) dostaje postęp po każdej porcji
+# Z skip_unchanged=True import jest pomijany, jeśli plik nie zmienił się od ostatniego importu (manifest w bazie)
 
-        imported_count = 0
+    try:
+        path_to_use = csv_file or CSV_FILE
+        LAST_IMPORT_STATS.clear()
+        LAST_IMPORT_STATS["file"] = path_to_use
 
-        with db.atomic():
-            for _, row in df.iterrows():
-                try:
-                    # Dodajemy pomijanie niekompletnych danych
-                    if pd.isna(row["amount"]) or pd.isna(row["date"]) or pd.isna(row["category"]):
-                        logger.warning(f"Pomijam wiersz z brakującymi danymi: {row}")
-                        continue
-
-                    # Dodajemy parsowanie daty
-                    try:
-                        date_obj = pd.to_datetime(str(row["date"]), errors='raise').date()
-                    except Exception:
-                        logger.warning(f"Niepoprawna data, pomijam wiersz: {row}")
-                        continue
-
-                    # Aktualizujemy istniejące wydatki lub tworzymy nowe
-                    existing = Expense.get_or_none(Expense.id == int(row["id"]))
-                    if existing:
-                        existing.amount = float(row["amount"])
-                        existing.category = row["category"]
-                        existing.date = date_obj
-                        existing.save()
-                    else:
-                        Expense.create(
-                            id=int(row["id"]),
-                            amount=float(row["amount"]),
-                            category=row["category"],
-                            date=date_obj
-                        )
-                    imported_count += 1
-                except Exception as e:
-                    logger.error(f"Błąd przetwarzania wiersza {row}: {e}")
-                    continue
+        if skip_unchanged and os.path.isfile(path_to_use) and csv_unchanged(path_to_use):
+            logger.info(f"Plik CSV nie zmienił się od ostatniego importu, pomijam: {path_to_use}")
+            LAST_IMPORT_STATS["skipped"] = True
+            return 0
+
+        logger.info(f"Importuję CSV z: {path_to_use}")
 
-        logger.info(f"Import z CSV zakończony. Zaimportowano {imported_count} rekordów.")
+        # Zmiany z dziennika muszą trafić do pliku przed importem, inaczej import by je cofnął
+        if path_to_use == CSV_FILE and journal_size() > 0:
+            compact_journal()
 
-        # Uzupełnienie kategorii w tabeli Category
-        expenses = list(Expense.select())
-        ensure_categories(expenses)
+        # Kodowanie wykrywamy raz z próbki i parsujemy plik tylko tym kodowaniem
+        encoding = detect_encoding(path_to_use)
+        logger.info(f"Wykryte kodowanie pliku CSV: {encoding}")
+        LAST_IMPORT_STATS["encoding"] = encoding
 
+        import_options = dict(
+            batch_size=batch_size,
+            reject_report=reject_report,
+            progress_callback=progress_callback
+        )
+        try:
+            imported_count = _import_csv_file(path_to_use, encoding, chunksize=chunksize, **import_options)
+        except UnicodeDecodeError as e:
+            # Próbka była poprawnym UTF-8, ale dalsza część pliku nie - jedyny przypadek drugiego odczytu
+            logger.warning(f"Plik nie jest poprawnym {encoding} ({e}), ponawiam import jako latin-1")
+            encoding = 'latin-1'
+            LAST_IMPORT_STATS["encoding"] = encoding
+            imported_count = _import_csv_file(path_to_use, encoding, chunksize=chunksize, **import_options)
+
+        save_import_manifest(path_to_use, imported_count)
         return imported_count
 
     except FileNotFoundError:
@@ -160,61 +471,387 @@ def import_from_csv(csv_file=None):
         logger.error(traceback.format_exc())
         return 0
 
+def _parse_csv_file(path):
+    # Uruchamiane w osobnym procesie: odczyt, mapowanie kolumn i walidacja jednego pliku (bez bazy)
+    # Błąd nie przerywa importu pozostałych plików - zwracamy go w statystykach
+    stats = {"file": path}
+    try:
+        encoding = detect_encoding(path)
+        stats["encoding"] = encoding
+        df = pd.read_csv(path, sep=',', encoding=encoding)
+        mapping = map_columns(df.columns)
+        if mapping is None:
+            raise ValueError(f"Niespodziewane kolumny: {list(df.columns)}")
+        valid, rejects = validate_expenses(df.rename(columns=mapping))
+        stats.update({
+            "rows": len(df),
+            "rejected": len(rejects),
+            "reject_reasons": rejects["Powód"].value_counts().to_dict()
+        })
+        return stats, valid
+    except Exception as e:
+        stats["error"] = str(e)
+        return stats, None
+
+def import_from_directory(source, workers=None, batch_size=None):
+    # Importujemy wiele plików CSV naraz (np. jeden plik na konto i miesiąc)
+    # source to katalog (bierzemy z niego *.csv) albo wzorzec glob, np. "data/2024-*.csv"
+    # Parsowanie i walidacja (pandas, CPU) działają równolegle w puli procesów,
+    # a zapis do bazy wykonuje jeden proces - pliki w kolejności alfabetycznej, każdy w osobnej transakcji
+    # Zwracamy listę statystyk dla każdego pliku (wiersze, zaimportowane, odrzucone, ewentualny błąd)
+    pattern = os.path.join(source, "*.csv") if os.path.isdir(source) else source
+    files = sorted(glob.glob(pattern))
+    if not files:
+        logger.error(f"Brak plików CSV dla: {source}")
+        return []
+
+    logger.info(f"Importuję {len(files)} plików CSV z: {source}")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or IMPORT_WORKERS or None) as executor:
+        for stats, valid in executor.map(_parse_csv_file, files):
+            if valid is not None:
+                try:
+                    with db.atomic():
+                        stats["imported"] = write_expenses(valid, batch_size=batch_size)
+                    CategoryRegistry.invalidate()
+                except Exception as e:
+                    stats["error"] = str(e)
+
+            if "error" in stats:
+                stats["imported"] = 0
+                logger.error(f"Błąd importu pliku {stats['file']}: {stats['error']}")
+            else:
+                logger.info(f"Zaimportowano {stats['imported']} z {stats['rows']} wierszy z pliku {stats['file']}")
+            results.append(stats)
+
+    # Po wszystkich plikach: sekwencja id (Postgres) i podsumowanie miesięczne
+    if use_copy():
+        reset_id_sequence()
+    ExpenseMonthlySummary.rebuild()
+
+    return results
+
+@contextmanager
+def file_lock(path):
+    # Blokada doradcza na pliku <path>.lock - tylko jeden zapisujący (wątek lub proces) naraz
+    # Bez fcntl (Windows) działamy bez blokady
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+@contextmanager
+def atomic_file(path):
+    # Zwracamy ścieżkę pliku tymczasowego obok docelowego; po udanym zapisie podmieniamy go jednym os.replace
+    # Czytający widzą zawsze stary albo nowy plik, nigdy w połowie zapisany
+    base, extension = os.path.splitext(path)
+    temp_path = f"{base}.{os.getpid()}.tmp{extension}"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def write_csv_atomically(df, path):
+    # Zapisujemy ramkę do CSV przez plik tymczasowy
+    with atomic_file(path) as temp_path:
+        df.to_csv(temp_path, index=False, encoding='utf-8-sig')
+
+def copy_export(path):
+    # Eksport w Postgresie: COPY ... TO STDOUT prosto do pliku, bez budowania obiektów i ramki
+    # Zwracamy liczbę wyeksportowanych wierszy
+    table = Expense._meta.table_name
+    cursor = db.cursor()
+    with atomic_file(path) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            cursor.copy_expert(
+                f"""COPY (SELECT e.id AS "ID", ROUND(e.amount / 100.0, 2) AS "Kwota", c.name AS "Kategoria", e.date AS "Data"
+                          FROM {table} e JOIN {Category._meta.table_name} c ON c.id = e.category_id
+                          ORDER BY e.date)
+                    TO STDOUT WITH (FORMAT csv, HEADER true)""", f)
+    return cursor.rowcount
+
 def export_to_csv():
     # Eksportujemy wszystkie wydatki z bazy do pliku CSV
     # Sortujemy po dacie
     # Zapisujemy z nagłówkami w języku polskim
+    # Plik podmieniamy atomowo i pod blokadą, żeby równoległe eksporty się nie przeplatały
+    # W Postgresie używamy COPY ... TO STDOUT
     try:
-        expenses_query = list(Expense.select().order_by(Expense.date))
+        if use_copy():
+            with file_lock(CSV_FILE):
+                exported = copy_export(CSV_FILE)
+                save_import_manifest(CSV_FILE)
+                clear_journal()
+            logger.info(f"Eksport do CSV (COPY) zakończony. Wyeksportowano {exported} rekordów.")
+            return
+
+        # Nazwy kategorii pobieramy tym samym zapytaniem (JOIN), bez osobnego zapytania na wydatek
+        expenses_query = list(Expense.select(Expense, Category).join(Category).order_by(Expense.date))
         # Dopiero teraz konwertujemy do listy
         expense_list = list(expenses_query)
-        if not expense_list:
-            pd.DataFrame(columns=["ID", "Kwota", "Kategoria", "Data"]).to_csv(CSV_FILE, index=False, encoding='utf-8-sig')
-            logger.info("Eksport pustej bazy do CSV zakończony.")
-            return
 
         # Budumey dataframe na podstawie obiektów Expense
         df = pd.DataFrame([{
             "ID": e.id,
             "Kwota": e.amount,
-            "Kategoria": e.category,
+            "Kategoria": e.category.name,
             "Data": e.date
-        } for e in expense_list])
+        } for e in expense_list], columns=["ID", "Kwota", "Kategoria", "Data"])
 
         # Zapisujemy do csvki
-        df.to_csv(CSV_FILE, index=False, encoding='utf-8-sig')
-        logger.info(f"Eksport do CSV zakończony. Wyeksportowano {len(expense_list)} rekordów.")
+        with file_lock(CSV_FILE):
+            write_csv_atomically(df, CSV_FILE)
+            # Plik odpowiada bazie - kolejny import może go pominąć, a dziennik zmian jest już zbędny
+            save_import_manifest(CSV_FILE)
+            clear_journal()
+
+        if not expense_list:
+            logger.info("Eksport pustej bazy do CSV zakończony.")
+        else:
+            logger.info(f"Eksport do CSV zakończony. Wyeksportowano {len(expense_list)} rekordów.")
     except Exception as e:
         logger.error(f"Błąd eksportu CSV: {e}")
         import traceback
         logger.error(traceback.format_exc())
 
+def journal_size():
+    # Rozmiar dziennika zmian w bajtach (0, jeśli go nie ma)
+    return os.path.getsize(JOURNAL_FILE) if os.path.isfile(JOURNAL_FILE) else 0
+
+def clear_journal():
+    # Usuwamy dziennik zmian, gdy CSV_FILE zawiera już wszystkie zmiany
+    if os.path.isfile(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
+
+def _category_names(expenses):
+    # Nazwy kategorii wydatków bez dołączonej kategorii (np. wiersze z UPDATE/DELETE ... RETURNING)
+    # pobieramy jednym zapytaniem, zamiast osobno dla każdego wydatku
+    ids = {e.category_id for e in expenses if isinstance(e, Expense) and "category" not in e.__rel__}
+    if not ids:
+        return {}
+    return dict(Category.select(Category.id, Category.name).where(Category.id.in_(ids)).tuples())
+
+def append_to_journal(operation, expense):
+    # Dopisujemy jedną zmianę (insert, update, delete) na końcu dziennika - koszt nie zależy od liczby wydatków
+    append_many_to_journal(operation, [expense])
+
+def append_many_to_journal(operation, expenses):
+    # Dopisujemy zmiany wielu wydatków przy jednym otwarciu (i jednej blokadzie) dziennika
+    try:
+        names = _category_names(expenses)
+        with file_lock(CSV_FILE):
+            new_file = journal_size() == 0
+            with open(JOURNAL_FILE, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(JOURNAL_COLUMNS)
+                for expense in expenses:
+                    if isinstance(expense, Expense) and expense.category_id in names:
+                        category = names[expense.category_id]
+                    else:
+                        category = getattr(expense.category, "name", expense.category)
+                    writer.writerow([operation, expense.id, expense.amount, category, expense.date])
+    except Exception as e:
+        logger.error(f"Błąd zapisu do dziennika zmian: {e}")
+
+def record_change(operation, expense):
+    # Zapisujemy kopię po zmianie jednego wydatku zgodnie z EXPORT_MODE
+    # W trybie "full" eksport wykonuje wątek w tle (export_worker), a nie wątek obsługujący żądanie
+    record_changes(operation, [expense])
+
+def record_changes(operation, expenses):
+    # Kopia po zmianie wielu wydatków naraz (operacje zbiorcze): jeden wpis do dziennika lub jeden eksport w tle
+    if not expenses:
+        return
+    if EXPORT_MODE == "journal":
+        append_many_to_journal(operation, expenses)
+    else:
+        from export_worker import schedule_export
+        schedule_export()
+
+def compact_journal():
+    # Przepisujemy CSV_FILE: aktualny plik + zmiany z dziennika (dla każdego ID liczy się ostatnia zmiana)
+    # Plik zapisujemy do pliku tymczasowego i podmieniamy, a potem usuwamy dziennik
+    # Zwracamy liczbę zastosowanych wpisów dziennika
+    try:
+        with file_lock(CSV_FILE):
+            if journal_size() == 0:
+                return 0
+
+            journal = pd.read_csv(JOURNAL_FILE, encoding='utf-8')
+            if os.path.isfile(CSV_FILE) and os.path.getsize(CSV_FILE) > 0:
+                current = pd.read_csv(CSV_FILE, encoding='utf-8-sig')
+                mapping = map_columns(current.columns)
+                if mapping is None:
+                    logger.error(f"Niespodziewane kolumny: {list(current.columns)}")
+                    return 0
+                current = current.rename(columns=mapping)[["id", "amount", "category", "date"]]
+            else:
+                current = pd.DataFrame(columns=["id", "amount", "category", "date"])
+
+            journal = journal.rename(columns={
+                "Operacja": "operation", "ID": "id", "Kwota": "amount", "Kategoria": "category", "Data": "date"
+            })
+            last_changes = journal.drop_duplicates("id", keep="last")
+            upserts = last_changes[last_changes["operation"] != "delete"][["id", "amount", "category", "date"]]
+
+            # Wiersze zmienione lub usunięte w dzienniku zastępujemy ich ostatnią wersją
+            merged = pd.concat([current[~current["id"].isin(last_changes["id"])], upserts], ignore_index=True)
+            merged = merged.sort_values("date", kind="stable")
+            merged.columns = ["ID", "Kwota", "Kategoria", "Data"]
+
+            write_csv_atomically(merged, CSV_FILE)
+            clear_journal()
+            save_import_manifest(CSV_FILE)
+
+        logger.info(f"Kompaktowanie dziennika zakończone. Zastosowano {len(journal)} zmian, w pliku {len(merged)} rekordów.")
+        return len(journal)
+    except Exception as e:
+        logger.error(f"Błąd kompaktowania dziennika zmian: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return 0
+
+def _to_arrow_table(df):
+    # Budujemy tabelę Arrow z kolumnami ID, Kwota, Kategoria, Data (jak w CSV)
+    # Kategoria jest kodowana słownikowo - każda nazwa zapisana raz, w wierszach tylko indeksy
+    import pyarrow as pa
+    schema = pa.schema([
+        ("ID", pa.int64()),
+        ("Kwota", pa.float64()),
+        ("Kategoria", pa.dictionary(pa.int32(), pa.string())),
+        ("Data", pa.date32())
+    ])
+    df = df.assign(
+        Kategoria=df["Kategoria"].astype(str).astype("category"),
+        Data=pd.to_datetime(df["Data"]).dt.date
+    )
+    return pa.Table.from_pandas(df[["ID", "Kwota", "Kategoria", "Data"]], schema=schema, preserve_index=False)
+
+def write_parquet(df, path):
+    # Zapisujemy ramkę (kolumny ID, Kwota, Kategoria, Data) do Parquet przez plik tymczasowy
+    import pyarrow.parquet as pq
+    with atomic_file(path) as temp_path:
+        pq.write_table(_to_arrow_table(df), temp_path)
+
+def read_parquet(path=None, columns=None):
+    # Czytamy kopię Parquet z mapowaniem pliku w pamięć (memory_map) - bez parsowania tekstu
+    # Zwracamy ramkę z kolumnami ID, Kwota, Kategoria (category), Data
+    import pyarrow.parquet as pq
+    return pq.read_table(path or PARQUET_FILE, columns=columns, memory_map=True).to_pandas()
+
+def export_to_parquet(path=None):
+    # Eksportujemy wszystkie wydatki z bazy do pliku Parquet (posortowane po dacie)
+    path = path or PARQUET_FILE
+    try:
+        rows = (Expense
+                .select(Expense.id, Expense.amount, Category.name, Expense.date)
+                .join(Category)
+                .order_by(Expense.date)
+                .tuples())
+        df = pd.DataFrame(list(rows), columns=["ID", "Kwota", "Kategoria", "Data"])
+        with file_lock(path):
+            write_parquet(df, path)
+        logger.info(f"Eksport do Parquet zakończony. Wyeksportowano {len(df)} rekordów.")
+        return len(df)
+    except Exception as e:
+        logger.error(f"Błąd eksportu Parquet: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return 0
+
+def import_from_parquet(path=None, batch_size=None, reject_report=None, chunksize=None, progress_callback=None):
+    # Importujemy wydatki z pliku Parquet tą samą ścieżką co CSV (mapowanie kolumn, walidacja, zapis)
+    # Plik czytamy porcjami (po grupach wierszy) z mapowaniem w pamięć
+    path = path or PARQUET_FILE
+    try:
+        import pyarrow.parquet as pq
+        logger.info(f"Importuję Parquet z: {path}")
+        LAST_IMPORT_STATS.clear()
+        LAST_IMPORT_STATS["file"] = path
+
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        total_rows = parquet_file.metadata.num_rows or 1
+        rows_read = [0]
+
+        def frames():
+            for batch in parquet_file.iter_batches(batch_size=chunksize or IMPORT_CHUNKSIZE):
+                rows_read[0] += batch.num_rows
+                yield batch.to_pandas()
+
+        return _import_frames(
+            frames(),
+            batch_size=batch_size,
+            reject_report=reject_report,
+            progress_callback=progress_callback,
+            position=lambda: rows_read[0] / total_rows
+        )
+    except FileNotFoundError:
+        logger.error(f"Brak pliku Parquet: {path}")
+        return 0
+    except Exception as e:
+        logger.error(f"Błąd importu Parquet: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return 0
+
+def csv_to_parquet(csv_file=None, parquet_file=None):
+    # Konwertujemy kopię CSV do Parquet (nagłówki PL lub EN, błędne wiersze pomijamy)
+    csv_file = csv_file or CSV_FILE
+    parquet_file = parquet_file or PARQUET_FILE
+    # Kodowanie wykrywamy tak jak przy imporcie CSV (BOM, UTF-8 albo latin-1)
+    encoding = detect_encoding(csv_file)
+    try:
+        df = pd.read_csv(csv_file, encoding=encoding)
+    except UnicodeDecodeError:
+        df = pd.read_csv(csv_file, encoding='latin-1')
+    mapping = map_columns(df.columns)
+    if mapping is None:
+        logger.error(f"Niespodziewane kolumny: {list(df.columns)}")
+        return 0
+    valid, rejects = validate_expenses(df.rename(columns=mapping))
+    if not rejects.empty:
+        logger.warning(f"Pominięto {len(rejects)} wierszy: {rejects['Powód'].value_counts().to_dict()}")
+    valid.columns = ["ID", "Kwota", "Kategoria", "Data"]
+    write_parquet(valid, parquet_file)
+    return len(valid)
+
+def parquet_to_csv(parquet_file=None, csv_file=None):
+    # Konwertujemy kopię Parquet do CSV z polskimi nagłówkami (jak export_to_csv)
+    csv_file = csv_file or CSV_FILE
+    df = read_parquet(parquet_file)
+    df["Kategoria"] = df["Kategoria"].astype(str)
+    with file_lock(csv_file):
+        write_csv_atomically(df, csv_file)
+    return len(df)
+
 print("Aktualna ścieżka CSV:", CSV_FILE)
 print("Czy plik istnieje?", os.path.exists(CSV_FILE))
 
 
 def reset_id_sequence():
     # Resetujemy sekwencję ID w Postgresie na podstawie największego id w tabeli Expense
+    # Jedno zapytanie: setval na sekwencji kolumny id (jeśli istnieje)
     # Dla SQLite w trybie TEST_MODE nie jest to wymamgane
     if TEST_MODE:
         logger.info("TEST_MODE: pomijam reset sekwencji ID (SQLite nie wymaga)")
         return
 
     try:
-        with db.atomic():
-            max_id = Expense.select(fn.MAX(Expense.id)).scalar() or 0
-            seq_name = Expense._meta.table_name + "_id_seq"
-
-            # Reset sekwencji tylko jeśli istnieje w Postgresie
-            db.execute_sql(f"""
-                        DO $$
-                        BEGIN
-                            IF EXISTS (SELECT 1 FROM pg_class WHERE relname = '{seq_name}') THEN
-                                PERFORM setval('{seq_name}', {max_id + 1}, false);
-                            END IF;
-                        END $$;
-                        """)
-
-            logger.info(f"Zresetowano sekwencję ID ({seq_name}) do: {max_id + 1}")
+        table = Expense._meta.table_name
+        next_id = db.execute_sql(f"""
+            SELECT setval(seq, COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)
+            FROM pg_get_serial_sequence('{table}', 'id') AS seq
+            WHERE seq IS NOT NULL
+            """).fetchone()
+        if next_id:
+            logger.info(f"Zresetowano sekwencję ID ({table}) do: {next_id[0]}")
     except Exception as e:
         logger.error(f"Błąd resetowania sekwencji ID: {e}")
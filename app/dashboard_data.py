@@ -0,0 +1,93 @@
+# Warstwa dostępu do danych dla widoków Streamlit
+# Ramki danych budujemy raz i trzymamy w st.cache_data (wspólnie dla wszystkich sesji i przebiegów)
+# Kluczem jest wersja danych z models.data_version() - każdy zapis Expense/Category ją zwiększa,
+# więc przebieg przy niezmienionych danych nie wykonuje żadnego zapytania do bazy
+import os
+import pandas as pd
+import streamlit as st
+from models import Expense, data_version
+from polish_months import POLISH_MONTHS
+import analytics
+
+# Ile wersji danych trzymamy w pamięci podręcznej dla każdej funkcji
+CACHE_ENTRIES = 16
+# Liczba wydatków na jednej stronie w zakładce zarządzania
+EXPENSE_PAGE_SIZE = int(os.getenv("EXPENSE_PAGE_SIZE", "50"))
+# Maksymalna liczba punktów wykresu narastającej sumy (0 = jeden punkt na każdy dzień)
+TREND_MAX_POINTS = int(os.getenv("TREND_MAX_POINTS", "500"))
+
+
+# Funkcja zamieniająca miesiąc 'RRRR-MM' na polską nazwę, np. 'Maj 2024'
+def polish_month_label(month_str):
+    year, month = month_str.split('-')
+    return f"{POLISH_MONTHS[int(month)]} {year}"
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _expense_page(version, after, limit, date_from, date_to, category, min_amount, max_amount):
+    # Jedna strona wydatków do zakładki zarządzania (od najnowszych) i informacja o następnej stronie
+    expenses, has_next = Expense.page(after=after, limit=limit, date_from=date_from, date_to=date_to,
+                                      category=category, min_amount=min_amount, max_amount=max_amount)
+    rows = [(e.id, e.amount, e.category.name, e.date) for e in expenses]
+    return pd.DataFrame(rows, columns=['ID', 'Kwota', 'Kategoria', 'Data']), has_next
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _expense_count(version):
+    return Expense.select().count()
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _available_months(version):
+    return analytics.available_months()
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _monthly_category_frame(version):
+    df = pd.DataFrame(analytics.monthly_category_totals(), columns=['month_str', 'category', 'amount'])
+    df['month_polish'] = df['month_str'].map(polish_month_label)
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _monthly_frame(version):
+    df = pd.DataFrame(analytics.monthly_totals(), columns=['month_str', 'amount'])
+    df['month_polish'] = df['month_str'].map(polish_month_label)
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _category_frame(version, month):
+    return pd.DataFrame(analytics.category_totals(month), columns=['category', 'amount'])
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _average_frame(version):
+    return pd.DataFrame(analytics.average_monthly_by_category(), columns=['Kategoria', 'Średni wydatek (zł)'])
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_ENTRIES)
+def _cumulative_frame(version, max_points):
+    df = pd.DataFrame(analytics.cumulative_totals(max_points), columns=['date', 'cumulative'])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+# Funkcje publiczne - zawsze pytają o bieżącą wersję danych
+def expense_page(after=None, limit=EXPENSE_PAGE_SIZE, date_from=None, date_to=None, category=None,
+                 min_amount=None, max_amount=None):
+    return _expense_page(data_version(), after, limit, date_from, date_to, category, min_amount, max_amount)
+
+def expense_count():
+    return _expense_count(data_version())
+
+def available_months():
+    return _available_months(data_version())
+
+def monthly_category_frame():
+    return _monthly_category_frame(data_version())
+
+def monthly_frame():
+    return _monthly_frame(data_version())
+
+def category_frame(month=None):
+    return _category_frame(data_version(), month)
+
+def average_frame():
+    return _average_frame(data_version())
+
+def cumulative_frame(max_points=TREND_MAX_POINTS):
+    return _cumulative_frame(data_version(), max_points or None)
@@ -1,4 +1,8 @@
 import os
+import sqlite3
+import threading
+import time
+import logging
 
 # Określamy, czy będziemy działać w trybie testowym
 # Pobieramy zmienną środowiskową TEST_MODE
@@ -6,42 +10,119 @@ import os
 # Jeśli "true" to uruchamiamy tryb testowy (baza w pamięci, SQLite)
 TEST_MODE = os.getenv('TEST_MODE', 'False').lower() == 'true'
 
-from peewee import PostgresqlDatabase, SqliteDatabase
+from peewee import PostgresqlDatabase, SqliteDatabase, fn
+from playhouse.pool import PooledPostgresqlDatabase, MaxConnectionsExceeded
+
+logger = logging.getLogger(__name__)
+
+# Pula połączeń Postgresa: każdy przebieg skryptu Streamlit (osobny wątek) pobiera własne połączenie
+# na początku (init_db) i oddaje je na końcu (close_db), więc sesje nie dzielą jednego połączenia
+# Maksymalna liczba jednocześnie wydanych połączeń
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "20"))
+# Po ilu sekundach od otwarcia połączenie jest zamykane zamiast wracać do puli
+DB_POOL_STALE_TIMEOUT = int(os.getenv("DB_POOL_STALE_TIMEOUT", "300"))
+# Ile sekund czekamy na wolne połączenie, gdy wszystkie są zajęte (potem MaxConnectionsExceeded)
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+class MonitoredPooledPostgresqlDatabase(PooledPostgresqlDatabase):
+    # Pula połączeń, która dodatkowo liczy oczekiwania na wolne połączenie i ich łączny czas
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = {"checkouts": 0, "waits": 0, "wait_time": 0.0}
+        self._stats_lock = threading.Lock()
+        self._waiting = threading.local()
+
+    def _connect(self):
+        try:
+            conn = super()._connect()
+        except MaxConnectionsExceeded:
+            # Wszystkie połączenia zajęte - connect() ponowi próbę po chwili
+            self._waiting.value = True
+            raise
+        with self._stats_lock:
+            self._stats["checkouts"] += 1
+        return conn
+
+    def connect(self, reuse_if_open=False):
+        self._waiting.value = False
+        started = time.monotonic()
+        try:
+            return super().connect(reuse_if_open)
+        finally:
+            if self._waiting.value:
+                with self._stats_lock:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time"] += time.monotonic() - started
+
+    def pool_stats(self):
+        # Stan puli do panelu diagnostycznego
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "max_connections": self._max_connections,
+            "in_use": len(self._in_use),
+            "idle": len(self._connections),
+        })
+        return stats
+
 
 # Wybieramy bazę danych zależnie od trybu
 if TEST_MODE:
     # Tryb testowy: baza w pamięci (SQLite)
     db = SqliteDatabase(':memory:')
 else:
-    # Tryb produkcyjny: baza PostgreSQL, konfiguracja z zmiennych środowiskowych
-    db = PostgresqlDatabase(
+    # Tryb produkcyjny: baza PostgreSQL z pulą połączeń, konfiguracja z zmiennych środowiskowych
+    db = MonitoredPooledPostgresqlDatabase(
         os.getenv('POSTGRES_DB', 'mybudgetdb'),
         user=os.getenv('POSTGRES_USER', 'postgres'),
         password=os.getenv('POSTGRES_PASSWORD', 'postgres'),
         host=os.getenv('POSTGRES_HOST', 'db'),
         port=int(os.getenv('POSTGRES_PORT', '5432')),
+        max_connections=DB_POOL_MAX_CONNECTIONS,
+        stale_timeout=DB_POOL_STALE_TIMEOUT,
+        timeout=DB_POOL_TIMEOUT,
     )
 
+
+def pool_stats():
+    # Statystyki puli połączeń lub None, jeśli baza nie używa puli (tryb testowy)
+    if isinstance(db, MonitoredPooledPostgresqlDatabase):
+        return db.pool_stats()
+    return None
+
+# Wyrażenie SQL zwracające miesiąc daty jako tekst 'RRRR-MM' (dla modeli i migracji)
+# SQLite nie ma date_trunc/to_char, więc dla niego używamy strftime
+def month_expression(field):
+    if isinstance(field.model._meta.database, SqliteDatabase):
+        return fn.strftime('%Y-%m', field)
+    return fn.to_char(field, 'YYYY-MM')
+
+# Czy baza obsługuje INSERT/UPDATE/DELETE ... RETURNING (zapis i odczyt zmienionych wierszy w jednym zapytaniu)
+# Postgres zawsze, SQLite od wersji 3.35
+def supports_returning(database):
+    if isinstance(database, SqliteDatabase):
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return isinstance(database, PostgresqlDatabase)
+
 def init_db():
     # Inicjalizacja połączenia z bazą
     # Sprawdzamy, czy połączenie jest zamknięte i jeśli tak, otwieramy je
-    # Tworzymy tabele na podstawie klas modeli dziedziczących po BaseModel
+    # (przy puli - pobieramy połączenie dla bieżącego wątku; stan połączenia jest osobny dla każdego wątku)
+    # Schemat (tabele, indeksy) zakładają wersjonowane migracje przy imporcie models - w procesie tylko raz
     try:
         if db.is_closed():
             db.connect()
-            print("Połączenie z bazą danych udane!")
-        # Tworzymy tabele w bazie na podstawie wszystkich modeli
-        from app.models import BaseModel
-        db.create_tables(BaseModel.__subclasses__(), safe=True)
+            logger.debug("Połączenie z bazą danych udane!")
     except Exception as e:
         print(f"Błąd połączenia: {e}")
 
 def close_db():
     # Zamykanie połączenia z bazą:
-    # Sprawdzamy, czy połączenie jest otwarte, jeśli tak zamykamy
+    # Sprawdzamy, czy połączenie jest otwarte, jeśli tak zamykamy (przy puli - oddajemy je do puli)
     try:
         if not db.is_closed():
             db.close()
-            print("Połączenie z bazą danych zamknięte!")
+            logger.debug("Połączenie z bazą danych zamknięte!")
     except Exception as e:
         print(f"Błąd zamykania połączenia: {e}")
@@ -0,0 +1,104 @@
+# Ograniczanie liczby punktów na wykresach Plotly
+# Do przeglądarki trafia najwyżej budżet punktów, niezależnie od ilości danych:
+# linie przerzedzamy algorytmem LTTB (Largest-Triangle-Three-Buckets - zachowuje szczyty i doliny),
+# a na wykresach kołowych i słupkowych kategorie spoza pierwszych N sklejamy w jedną "Inne"
+import os
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# Maksymalna liczba punktów jednej serii na wykresie liniowym (0 = bez ograniczenia)
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1000"))
+# Maksymalna liczba kategorii na wykresie kołowym/słupkowym, łącznie z "Inne" (0 = bez ograniczenia)
+CHART_MAX_CATEGORIES = int(os.getenv("CHART_MAX_CATEGORIES", "12"))
+# Od tylu punktów wykres liniowy rysujemy śladami WebGL (scattergl) zamiast SVG
+WEBGL_MIN_POINTS = int(os.getenv("WEBGL_MIN_POINTS", "500"))
+
+OTHER_LABEL = "Inne"
+OTHER_COLOR = "#D3D3D3"
+
+
+def _numeric(values):
+    # Oś x jako liczby dla LTTB: daty -> nanosekundy, liczby bez zmian, tekst (np. nazwy miesięcy) -> pozycja
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('int64').to_numpy(dtype=np.float64)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    return np.arange(len(values), dtype=np.float64)
+
+
+def lttb_indices(x, y, max_points):
+    # Indeksy punktów wybranych przez LTTB: pierwszy, ostatni i po jednym z każdego z max_points - 2 kubełków
+    # (ten, który z wybranym wcześniej punktem i średnią następnego kubełka tworzy największy trójkąt)
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (max_points - 2)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def lttb(df, x, y, max_points=CHART_MAX_POINTS):
+    # Ramka przerzedzona do max_points wierszy (kolejność wierszy bez zmian)
+    if not max_points or len(df) <= max_points:
+        return df
+    return df.iloc[lttb_indices(df[x], df[y], max_points)]
+
+
+def fold_categories(df, category, value, max_categories=CHART_MAX_CATEGORIES):
+    # Zostawiamy max_categories - 1 kategorii o największej sumie, resztę sumujemy jako "Inne"
+    # Pozostałe kolumny (np. miesiąc) są kluczem grupowania, więc sumy w "Inne" liczą się osobno dla każdego z nich
+    if not max_categories or df[category].nunique() <= max_categories:
+        return df
+    totals = df.groupby(category)[value].sum()
+    keep = totals.nlargest(max_categories - 1).index
+    df = df.copy()
+    df[category] = df[category].where(df[category].isin(keep), OTHER_LABEL)
+    keys = [column for column in df.columns if column != value]
+    return df.groupby(keys, sort=False, as_index=False, dropna=False)[value].sum()
+
+
+def _with_other(kwargs, category):
+    # "Inne" dostaje szary kolor i trafia na koniec ustalonej kolejności kategorii
+    if 'color_discrete_map' in kwargs:
+        kwargs['color_discrete_map'] = {**kwargs['color_discrete_map'], OTHER_LABEL: OTHER_COLOR}
+    orders = kwargs.get('category_orders')
+    if orders and category in orders and OTHER_LABEL not in orders[category]:
+        kwargs['category_orders'] = {**orders, category: list(orders[category]) + [OTHER_LABEL]}
+    return kwargs
+
+
+def line_chart(df, x, y, max_points=CHART_MAX_POINTS, **kwargs):
+    # px.line z przerzedzeniem LTTB i śladami WebGL dla dużych serii
+    df = lttb(df, x, y, max_points)
+    if len(df) >= WEBGL_MIN_POINTS:
+        kwargs.setdefault('render_mode', 'webgl')
+    return px.line(df, x=x, y=y, **kwargs)
+
+
+def bar_chart(df, x, y, category=None, max_categories=CHART_MAX_CATEGORIES, **kwargs):
+    # px.bar ze sklejaniem nadmiarowych kategorii (domyślnie kategorie są na osi x)
+    category = category or x
+    df = fold_categories(df, category, y, max_categories)
+    return px.bar(df, x=x, y=y, **_with_other(kwargs, category))
+
+
+def pie_chart(df, names, values, max_categories=CHART_MAX_CATEGORIES, **kwargs):
+    # px.pie ze sklejaniem najmniejszych wycinków w "Inne"
+    df = fold_categories(df, names, values, max_categories)
+    return px.pie(df, names=names, values=values, **_with_other(kwargs, names))
@@ -0,0 +1,90 @@
+import os
+import queue
+import threading
+import time
+import logging
+from backup import export_to_csv
+from database import db, TEST_MODE
+
+logger = logging.getLogger(__name__)
+
+# Eksport wykonujemy dopiero, gdy przez EXPORT_DEBOUNCE_SECONDS nie przyszła żadna nowa zmiana
+# Przy ciągłych zmianach eksport i tak rusza najpóźniej po EXPORT_MAX_DELAY_SECONDS
+EXPORT_DEBOUNCE_SECONDS = float(os.getenv("EXPORT_DEBOUNCE_SECONDS", "1.0"))
+EXPORT_MAX_DELAY_SECONDS = float(os.getenv("EXPORT_MAX_DELAY_SECONDS", "10.0"))
+
+
+class ExportWorker:
+    # Wątek w tle, który zbiera prośby o eksport z kolejki
+    # Seria zmian w krótkim czasie kończy się jednym eksportem zamiast eksportu po każdej zmianie
+
+    def __init__(self, export_func=export_to_csv, debounce=EXPORT_DEBOUNCE_SECONDS, max_delay=EXPORT_MAX_DELAY_SECONDS):
+        self.export_func = export_func
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.requests = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # Liczba zgłoszonych, jeszcze nieobsłużonych próśb
+        self.pending = 0
+        # Ustawione, gdy nie ma oczekujących próśb ani trwającego eksportu
+        self.idle = threading.Event()
+        self.idle.set()
+        self.export_count = 0
+
+    def start(self):
+        # Uruchamiamy wątek przy pierwszej prośbie (i ponownie, gdyby przestał działać)
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="export-worker", daemon=True)
+                self.thread.start()
+
+    def request_export(self):
+        # Zgłaszamy prośbę o eksport - wraca od razu, niezależnie od wielkości tabeli
+        with self.lock:
+            self.pending += 1
+            self.idle.clear()
+        self.requests.put(time.monotonic())
+        self.start()
+
+    def wait_idle(self, timeout=None):
+        # Czekamy, aż wszystkie zgłoszone eksporty zostaną wykonane
+        return self.idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            first_request = self.requests.get()
+            collected = 1
+            # Zbieramy kolejne prośby, dopóki przychodzą częściej niż co debounce sekund
+            while time.monotonic() - first_request < self.max_delay:
+                try:
+                    self.requests.get(timeout=self.debounce)
+                    collected += 1
+                except queue.Empty:
+                    break
+
+            try:
+                # Połączenie z puli tylko na czas eksportu - wątek w tle nie trzyma go między eksportami
+                with db.connection_context():
+                    self.export_func()
+                self.export_count += 1
+            except Exception as e:
+                logger.error(f"Błąd eksportu w tle: {e}")
+
+            with self.lock:
+                self.pending -= collected
+                if self.pending == 0:
+                    self.idle.set()
+
+
+# Jeden wątek eksportu na proces aplikacji (wspólny dla wszystkich sesji Streamlit)
+export_worker = ExportWorker()
+
+
+def schedule_export():
+    # Zlecamy eksport CSV w tle
+    # W TEST_MODE baza SQLite jest w pamięci i nie jest widoczna z innego wątku, więc eksportujemy od razu
+    if TEST_MODE:
+        export_to_csv()
+        return
+    export_worker.request_export()
@@ -2,18 +2,31 @@
 import streamlit as st
 # Import biblioteki pandas do pracy z danymi tabelarycznymi
 import pandas as pd
-# Import biblioteki plotly.express do tworzenia interaktywnych wykresów
-import plotly.express as px
+# Wykresy plotly.express z ograniczeniem liczby punktów (LTTB, sklejanie kategorii w "Inne")
+from downsampling import line_chart, bar_chart, pie_chart
 # Import klas Expense, Category
-from models import Expense, Category
+from models import Expense, Category, CategoryRegistry, ExpenseMonthlySummary
 # Import funkcji inicjalizującej bazę danych
-from database import init_db
-from backup import import_from_csv, export_to_csv, CSV_FILE
+from database import init_db, close_db, pool_stats
+from backup import import_from_csv, CSV_FILE, IMPORT_CHUNKSIZE, get_import_manifest
+from backup import record_change, record_changes, compact_journal, journal_size, EXPORT_MODE
+from export_worker import schedule_export
+from dashboard_data import expense_page, expense_count, available_months, monthly_category_frame, monthly_frame
+from dashboard_data import category_frame, average_frame, cumulative_frame, polish_month_label
 from colors import PASTEL_COLORS
 from categories import DEFAULT_CATEGORIES
 from polish_months import POLISH_MONTHS
+from money import series_to_grosze, to_zloty
 
 def main():
+    # Połączenie z bazą (z puli) jest pobierane na początku przebiegu i oddawane na jego końcu,
+    # także gdy przebieg kończy się wyjątkiem lub st.experimental_rerun()
+    try:
+        render()
+    finally:
+        close_db()
+
+def render():
 
     import os
 
@@ -30,11 +43,21 @@ def main():
         st.subheader("Diagnostyka")
         try:
             # import loguje do konsoli; poniżej dorzucamy licznik z bazy
-            import_from_csv()
-            from backup import reset_id_sequence
-            reset_id_sequence()
+            # Plik czytamy porcjami, a pasek postępu aktualizujemy po każdej z nich
+            import_progress = st.progress(0.0)
+
+            def show_import_progress(rows_done, imported, fraction):
+                import_progress.progress(fraction or 0.0, text=f"Import CSV: {rows_done} wierszy, zapisano {imported}")
+
+            # Import wykonujemy tylko, gdy plik zmienił się od ostatniego importu
+            # Sekwencję ID w Postgresie import ustawia sam na końcu scalania (COPY)
+            import_from_csv(chunksize=IMPORT_CHUNKSIZE, progress_callback=show_import_progress, skip_unchanged=True)
+            import_progress.empty()
+            manifest = get_import_manifest()
+            if manifest and manifest.imported_at:
+                st.caption(f"Ostatni import CSV: {manifest.imported_at:%Y-%m-%d %H:%M:%S} ({manifest.imported_count} rekordów)")
             try:
-                total = Expense.select().count()
+                total = expense_count()
             except Exception as e:
                 total = 0
                 st.error(f"Błąd zapytania do bazy po imporcie: {e}")
@@ -44,54 +67,67 @@ def main():
         except Exception as e:
             st.error(f"Błąd importu CSV: {e}")
 
+        # W trybie dziennika zmiany są dopisywane do osobnego pliku, a CSV przepisujemy na żądanie
+        if EXPORT_MODE == "journal":
+            st.write("Dziennik zmian (bajty):", journal_size())
+            if st.button("Kompaktuj dziennik zmian", key="compact_journal_button"):
+                applied = compact_journal()
+                st.success(f"Przeniesiono {applied} zmian z dziennika do CSV")
+
+        # Naprawa podsumowania miesięcznego (przeliczenie od zera z tabeli wydatków)
+        if st.button("Przelicz podsumowanie miesięczne", key="rebuild_summary_button"):
+            rows = ExpenseMonthlySummary.rebuild()
+            st.success(f"Przeliczono podsumowanie miesięczne: {rows} wierszy")
+
+        # Stan puli połączeń z bazą (tylko Postgres)
+        stats = pool_stats()
+        if stats:
+            st.caption(
+                f"Pula połączeń: w użyciu {stats['in_use']}/{stats['max_connections']}, wolne {stats['idle']}, "
+                f"oczekiwania {stats['waits']} ({stats['wait_time']:.2f} s), pobrania {stats['checkouts']}"
+            )
+
     # Funkcja zwracająca listę dostępnych kategorii
     def get_categories():
-        cats = [c.name for c in Category.get_all_categories()]
-        return [c for c in cats if Category.get_or_none(Category.name == c)]
+        # Nazwy kategorii ze wspólnego rejestru (bez zapytania do bazy, dopóki kategorie się nie zmienią)
+        return CategoryRegistry.names()
+
+    def category_colors(names):
+        # Kolory kategorii z rejestru; kategorie, których nie ma w bazie, dodajemy jednym INSERT-em
+        missing = [name for name in names if CategoryRegistry.get(name) is None]
+        if missing:
+            # Rejestr mógł zostać wczytany, zanim inna sesja zatwierdziła swoje kategorie - sprawdzamy jeszcze raz
+            CategoryRegistry.invalidate()
+            missing = [name for name in names if CategoryRegistry.get(name) is None]
+        if missing:
+            Category.create_categories(missing)
+        return CategoryRegistry.color_map(names)
 
     # Funkcja – analiza miesięcznych wydatków wg kategorii
     def monthly_expenses_by_category():
         try:
-            # Pobieramy wszystkie wydatki
-            expenses = Expense.select()
-            if not expenses:
+            # Lista miesięcy z wydatkami (z pamięci podręcznej, odświeżana po zapisach)
+            months = available_months()
+            if not months:
                 st.info("Brak danych do wyświetlenia")
                 return
 
-            # Konwertujemy do df
-            expense_df = pd.DataFrame([e.__data__ for e in expenses])
-            expense_df['date'] = pd.to_datetime(expense_df['date'])
-
-            # Dodajemy kolumny z miesiącami (string + polskie nazwy)
-            expense_df['month_period'] = expense_df['date'].dt.to_period('M')
-            expense_df['month_str'] = expense_df['month_period'].astype(str)
-            expense_df['month_polish'] = expense_df['date'].dt.month.map(POLISH_MONTHS) + ' ' + expense_df[
-                'date'].dt.year.astype(str)
-
             # Wybór miesiąca przez użytkownika
-            available_months = sorted(expense_df['month_str'].unique(), reverse=True)
             selected_month_str = st.selectbox(
                 "Wybierz miesiąc",
-                options=available_months,
-                format_func=lambda x: f"{POLISH_MONTHS[int(x.split('-')[1])]} {x.split('-')[0]}"
+                options=months,
+                format_func=polish_month_label
             )
 
-            # Filtrujemy dane dla wybranego miesiąca
-            filtered_df = expense_df[expense_df['month_str'] == selected_month_str]
+            # Sumy po kategorii dla wybranego miesiąca liczy baza (GROUP BY)
+            category_summary = category_frame(selected_month_str)
+            polish_month_name = polish_month_label(selected_month_str)
 
-            if filtered_df.empty:
-                year, month = selected_month_str.split('-')
-                polish_month_name = f"{POLISH_MONTHS[int(month)]} {year}"
+            if category_summary.empty:
                 st.info(f"Brak wydatków dla {polish_month_name}")
                 return
 
-            # Grupujemy po kategorii i sumujemy kwoty
-            category_summary = filtered_df.groupby('category')['amount'].sum().reset_index()
-            category_summary = category_summary.sort_values('amount', ascending=False)
-
             # Wyświetlamy nagłówek z podsumowaniem
-            year, month = selected_month_str.split('-')
-            polish_month_name = f"{POLISH_MONTHS[int(month)]} {year}"
             st.subheader(f"Suma wszystkich wydatków w {polish_month_name}")
 
             # Wyświetlamy tabele z wydatkami
@@ -103,18 +139,10 @@ def main():
             )
 
             # Ustalamy unikalne kolory dla kategorii
-            categories_in_data = filtered_df['category'].unique()
-            color_map = {}
-            for cat in categories_in_data:
-                c = Category.get_or_none(Category.name == cat)
-                if c:
-                    color_map[cat] = c.color
-                else:
-                    c = Category.create_category(cat, color=None)
-                    color_map[cat] = c.color
+            color_map = category_colors(category_summary['category'].unique())
 
             # Tworzymy wykres słupkowy
-            fig = px.bar(
+            fig = bar_chart(
                 category_summary,
                 x='category',
                 y='amount',
@@ -126,8 +154,8 @@ def main():
             fig.update_layout(xaxis_tickangle=-45)
             st.plotly_chart(fig, use_container_width=True)
 
-            # Wyświetlamy sumę wydatków
-            total = category_summary['amount'].sum()
+            # Wyświetlamy sumę wydatków (sumujemy całkowite grosze, żeby suma była dokładna)
+            total = to_zloty(series_to_grosze(category_summary['amount']).sum())
             st.metric("Łączna kwota", f"{total:.2f} zł")
 
         except Exception as e:
@@ -136,22 +164,85 @@ def main():
     # Funkcja – zarządzanie wydatkami (lista, edycja, usuwanie)
     def manage_expenses():
         try:
-            expenses = list(Expense.select().order_by(Expense.date.desc()))
-            if not expenses:
-                st.warning("Brak wydatków. Dodaj pierwszy wydatek w formularzu powyżej.")
+            # Filtry listy wydatków - trafiają do zapytania, więc baza zwraca tylko pasujące wiersze
+            with st.expander("Filtry"):
+                date_from = date_to = None
+                if st.checkbox("Filtruj po dacie", key="expense_filter_dates"):
+                    col_from, col_to = st.columns(2)
+                    with col_from:
+                        date_from = st.date_input("Data od", key="expense_filter_from")
+                    with col_to:
+                        date_to = st.date_input("Data do", key="expense_filter_to")
+                category = st.selectbox("Kategoria", ["Wszystkie"] + get_categories(), key="expense_filter_category")
+                col_min, col_max = st.columns(2)
+                with col_min:
+                    min_amount = st.number_input("Kwota od (0 = bez limitu)", min_value=0.0, step=0.01, key="expense_filter_min")
+                with col_max:
+                    max_amount = st.number_input("Kwota do (0 = bez limitu)", min_value=0.0, step=0.01, key="expense_filter_max")
+            filters = {
+                "date_from": date_from,
+                "date_to": date_to,
+                "category": None if category == "Wszystkie" else category,
+                "min_amount": min_amount or None,
+                "max_amount": max_amount or None,
+            }
+
+            # Stronicowanie po kluczu: w sesji trzymamy kursory (data, id) odwiedzonych stron,
+            # pierwsza strona ma kursor None; zmiana filtrów wraca na pierwszą stronę
+            if st.session_state.get("expense_page_filters") != filters:
+                st.session_state["expense_page_filters"] = filters
+                st.session_state["expense_page_cursors"] = [None]
+            cursors = st.session_state["expense_page_cursors"]
+
+            # Strona wydatków z pamięci podręcznej (odświeżana po każdym zapisie)
+            expense_df, has_next = expense_page(after=cursors[-1], **filters)
+            if expense_df.empty and len(cursors) > 1:
+                # Strona opustoszała (np. po usunięciu wydatków) - wracamy na początek listy
+                st.session_state["expense_page_cursors"] = [None]
+                st.experimental_rerun()
+            if expense_df.empty:
+                if any(value is not None for value in filters.values()):
+                    st.info("Brak wydatków spełniających filtry.")
+                else:
+                    st.warning("Brak wydatków. Dodaj pierwszy wydatek w formularzu powyżej.")
                 return
 
-            # Wyświetlamy tabelę z dodanymi wydatkami
-            expense_df = pd.DataFrame([{
-                'ID': e.id,
-                'Kwota': e.amount,
-                'Kategoria': e.category,
-                'Data': e.date,
-            } for e in expenses])
+            # Wyświetlamy bieżącą stronę wydatków
             st.dataframe(expense_df.set_index('ID'))
 
+            # Przyciski poprzedniej/następnej strony
+            col_prev, col_page, col_next = st.columns(3)
+            with col_prev:
+                if st.button("← Poprzednia", key="expense_prev_page", disabled=len(cursors) == 1):
+                    cursors.pop()
+                    st.experimental_rerun()
+            with col_page:
+                st.caption(f"Strona {len(cursors)}")
+            with col_next:
+                if st.button("Następna →", key="expense_next_page", disabled=not has_next):
+                    last = expense_df.iloc[-1]
+                    cursors.append((last['Data'], int(last['ID'])))
+                    st.experimental_rerun()
+
+            # Operacje zbiorcze na wydatkach z bieżącej strony (jedno zapytanie na porcję wydatków, a nie na wydatek)
+            with st.expander("Operacje zbiorcze"):
+                selected_ids = st.multiselect("Zaznacz wydatki z bieżącej strony", expense_df['ID'].tolist(), key="bulk_expense_ids")
+                bulk_category = st.selectbox("Nowa kategoria", get_categories(), key="bulk_category_select")
+                col_bulk_update, col_bulk_delete = st.columns(2)
+                with col_bulk_update:
+                    if st.button("Zmień kategorię zaznaczonych", key="bulk_update_button", disabled=not selected_ids):
+                        updated = Expense.update_many(selected_ids, category=bulk_category)
+                        record_changes("update", updated)
+                        st.success(f"Zmieniono kategorię {len(updated)} wydatków na '{bulk_category}'")
+                with col_bulk_delete:
+                    if st.button("Usuń zaznaczone", key="bulk_delete_button", disabled=not selected_ids):
+                        deleted = Expense.delete_many(selected_ids)
+                        record_changes("delete", deleted)
+                        st.success(f"Usunięto {len(deleted)} wydatków")
+                        st.experimental_rerun()
+
             # Wpisanie ID wydatku ręcznie (generuje to najmniej błędów)
-            first_id = expenses[0].id if expenses else 1
+            first_id = int(expense_df['ID'].iloc[0])
             selected_id = st.number_input(
                 "Wpisz ID wydatku do edycji/usunięcia",
                 min_value=1,
@@ -171,22 +262,23 @@ def main():
                 # Formularz edycji wydatku
                 with st.form("edit_expense"):
                     old_amount = expense_to_edit.amount
-                    old_category = expense_to_edit.category
+                    old_category = expense_to_edit.category.name
 
                     new_amount = st.number_input("Kwota", value=expense_to_edit.amount, min_value=0.01, step=0.01)
-                    new_category = st.selectbox("Kategoria", get_categories(), index=get_categories().index(expense_to_edit.category))
+                    categories = get_categories()
+                    new_category = st.selectbox("Kategoria", categories, index=categories.index(expense_to_edit.category.name))
                     new_date = st.date_input("Data", value=expense_to_edit.date)
 
                     if st.form_submit_button("Zapisz zmiany"):
                         old_amount = expense_to_edit.amount
-                        old_category = expense_to_edit.category
+                        old_category = expense_to_edit.category.name
                         old_date = expense_to_edit.date
 
                         expense_to_edit.amount = new_amount
-                        expense_to_edit.category = new_category
+                        expense_to_edit.category = Category.get(Category.name == new_category)
                         expense_to_edit.date = new_date
                         expense_to_edit.save()
-                        export_to_csv()
+                        record_change("update", expense_to_edit)
 
                         # Tworzymy komunikat tylko z faktycznymi zmianami
                         msg_lines = [f"Wydatek ID {selected_id} zaktualizowany:"]
@@ -209,10 +301,10 @@ def main():
 
                 with col2a:
                     if st.button("Usuń wydatek", key="delete_button"):
-                        category = expense_to_edit.category
+                        category = expense_to_edit.category.name
                         amount = expense_to_edit.amount
                         Expense.delete_expense(selected_id)
-                        export_to_csv()
+                        record_change("delete", expense_to_edit)
                         st.success(
                             f"Usunięto wydatek ID {selected_id} w kategorii '{category}' "
                             f"o kwocie {amount:.2f} zł"
@@ -229,9 +321,9 @@ def main():
 
     # Funkcja – zarządzanie kategoriami (dodawanie, usuwanie, aktywacja, dezaktywacja)
     def manage_categories():
-        # Pobierz wszystkie kategorie z bazy
-        all_categories = [c.name for c in Category.get_all_categories()]
-        active_categories = [c.name for c in Category.get_active_categories()]
+        # Wszystkie i aktywne kategorie z rejestru kategorii (baza jest pytana tylko po zmianie kategorii)
+        all_categories = CategoryRegistry.names()
+        active_categories = CategoryRegistry.names(active_only=True)
 
         # Formularz dodania nowej kategorii
         with st.form("add_category_form"):
@@ -260,8 +352,8 @@ def main():
                 try:
                     deleted = Category.delete_with_expenses(category_to_remove)
                     if deleted:
-                        # Zaktualizujemy CSV
-                        export_to_csv()
+                        # Zaktualizujemy CSV (eksport w tle)
+                        schedule_export()
                         st.success(
                             f"Usunięto kategorię i wszystkie wydatki w niej zawarte: {category_to_remove}"
                         )
@@ -292,7 +384,7 @@ def main():
             st.info("Brak aktywnych kategorii do dezaktywacji")
 
         # Formularz aktywacji kategorii
-        inactive_categories = [c.name for c in Category.get_all_categories() if not c.is_active]
+        inactive_categories = [name for name in all_categories if name not in active_categories]
         if inactive_categories:
             with st.form("activate_category_form"):
                 category_to_activate = st.selectbox(
@@ -302,10 +394,7 @@ def main():
                 )
                 if st.form_submit_button("Aktywuj kategorię"):
                     try:
-                        cat = Category.get_or_none(Category.name == category_to_activate)
-                        if cat:
-                            cat.is_active = True
-                            cat.save()
+                        if Category.activate_category(category_to_activate):
                             st.success(f"Kategoria '{category_to_activate}' została aktywowana")
                         else:
                             st.warning("Nie znaleziono kategorii")
@@ -317,25 +406,12 @@ def main():
 
     # Funkcja – średnie miesięczne wydatki wg kategorii
     def average_monthly_expense_by_category():
-        expenses = Expense.select()
-        if not expenses:
+        # Sumy miesięczne i ich średnią po kategorii liczy baza
+        avg_df = average_frame()
+        if avg_df.empty:
             st.info("Brak danych do wyświetlenia")
             return
 
-        df = pd.DataFrame([e.__data__ for e in expenses])
-        df['date'] = pd.to_datetime(df['date'])
-
-        # Chcemy wyodrębnić rok i miesiąc
-        df['year_month'] = df['date'].dt.to_period('M')
-
-        # Sumujemy wydatki miesięcznie po kategorii
-        monthly_sum = df.groupby(['year_month', 'category'])['amount'].sum().reset_index()
-
-        # Chcemy uzyskać średnie miesięczne wydatki dla każdej kategorii
-        avg_df = monthly_sum.groupby('category')['amount'].mean().reset_index()
-        avg_df = avg_df.rename(columns={'amount': 'Średni wydatek (zł)', 'category': 'Kategoria'})
-        avg_df = avg_df.sort_values('Średni wydatek (zł)', ascending=False)
-
         st.subheader("Średni miesięczny wydatek według kategorii")
         st.dataframe(avg_df.set_index('Kategoria'))
         return avg_df
@@ -349,7 +425,7 @@ def main():
         amount = st.number_input("Kwota", min_value=0.01, step=0.01)
 
         # Pobieramy tylko aktywne kategorie
-        active_categories = [c.name for c in Category.get_active_categories()]
+        active_categories = CategoryRegistry.names(active_only=True)
         if not active_categories:
             st.warning("Brak aktywnych kategorii. Dodaj lub aktywuj kategorię przed dodaniem wydatku.")
         else:
@@ -358,8 +434,8 @@ def main():
 
             if st.form_submit_button("Dodaj wydatek"):
                 try:
-                    Expense.create_expense(amount=amount, category=category, date=date)
-                    export_to_csv()
+                    expense = Expense.create_expense(amount=amount, category=category, date=date)
+                    record_change("insert", expense)
                     st.success("Wydatek dodany!")
                     st.experimental_rerun()
                 except ValueError as e:
@@ -370,40 +446,15 @@ def main():
 
     # Zawartość pierwszej zakładki - Podsumowanie
     with tab1:
-        # Pobieramy wszystkie wydatki i dokonujemy konwersji do df
-        expenses = Expense.select()
-        expense_df = pd.DataFrame([e.__data__ for e in expenses])
-        categories_in_data = expense_df['category'].unique()
-        color_map = {}
-        for cat in categories_in_data:
-            # Pobieramy obiekt kategorii z bazy
-            c = Category.get_or_none(Category.name == cat)
-            if c:
-                color_map[cat] = c.color
-            else:
-                # Jeśli kategorii nie ma w bazie, tworzymy ją z unikalnym kolorem
-                c = Category.create_category(cat, color=None)
-                color_map[cat] = c.color
-
-        if not expense_df.empty:
-            # Konwertujemy daty do formatu datetime
-            expense_df['date'] = pd.to_datetime(expense_df['date'])
-
-            # Dodajemy polskie nazwy miesięcy (używamy tylko stringów)
-            expense_df['month_str'] = expense_df['date'].dt.to_period('M').astype(str)
-            expense_df['month_polish'] = expense_df['date'].dt.month.map(POLISH_MONTHS) + ' ' + expense_df[
-                'date'].dt.year.astype(str)
-
-            # Grupujemy dane po stringach
-            monthly_df = expense_df.groupby(['month_str', 'month_polish', 'category'])['amount'].sum().reset_index()
-            monthly_df = monthly_df.sort_values('month_str')
-
-            # Przed tworzeniem fig (bar) i fig_pie:
-            category_df = expense_df.groupby('category')['amount'].sum().reset_index()
+        # Sumy po miesiącu i kategorii oraz sumy po kategorii (od największej) - z pamięci podręcznej
+        monthly_df = monthly_category_frame()
+        category_df = category_frame()
+        # Kolory kategorii z rejestru (jeden słownik zamiast zapytania o każdą kategorię)
+        color_map = category_colors(category_df['category'].unique())
 
+        if not monthly_df.empty:
             # Chcemy aby były w kolejności od największej do najmniejszej
-            category_order = (category_df.sort_values('amount', ascending=False)['category'].tolist()
-            )
+            category_order = category_df['category'].tolist()
 
             # Dodajemy kolumnę datetime dla pierwszego dnia miesiąca
             monthly_df['month_date'] = pd.to_datetime(monthly_df['month_str'] + '-01')
@@ -412,10 +463,11 @@ def main():
             monthly_df = monthly_df.sort_values('month_date')
 
             # Wykres słupkowy
-            fig = px.bar(
+            fig = bar_chart(
                 monthly_df,
                 x='month_polish',
                 y='amount',
+                category='category',
                 color='category',
                 barmode='stack',
                 title="Struktura wydatków według kategorii (miesięcznie)",
@@ -448,10 +500,9 @@ def main():
                 height=600
             )
             st.plotly_chart(fig, use_container_width=True)
-            category_df = expense_df.groupby('category')['amount'].sum().reset_index()
 
             # Wykres kołowy
-            fig_pie = px.pie(
+            fig_pie = pie_chart(
                 category_df,
                 values='amount',
                 names='category',
@@ -484,23 +535,12 @@ def main():
 
     # Zawartość drugiej zakładki - Analiza trendów
     with tab2:
-        expenses = Expense.select().order_by(Expense.date)
-        if expenses:
-            trend_df = pd.DataFrame([e.__data__ for e in expenses])
-
-            # Konwertujemy daty do formatu datetime
-            trend_df['date'] = pd.to_datetime(trend_df['date'])
-
-            # Dodajemy polskie nazwy miesięcy
-            trend_df['month_str'] = trend_df['date'].dt.to_period('M').astype(str)
-            trend_df['month_polish'] = trend_df['date'].dt.month.map(POLISH_MONTHS) + ' ' + trend_df['date'].dt.year.astype(
-                str)
-
-            # Obliczamy sumę skumulowaną
-            trend_df['cumulative'] = trend_df['amount'].cumsum()
-
+        # Sumę narastającą liczy baza (funkcja okna po sumach dziennych) - najwyżej jeden punkt na dzień,
+        # a dla długich zakresów co k-ty dzień, tak aby nie przekroczyć TREND_MAX_POINTS punktów
+        trend_df = cumulative_frame()
+        if not trend_df.empty:
             # Wykres trendu skumulowanego
-            fig_trend = px.line(trend_df,
+            fig_trend = line_chart(trend_df,
                                 x='date',
                                 y='cumulative',
                                 title='Narastająca suma wydatków w czasie',
@@ -523,12 +563,10 @@ def main():
 
             st.plotly_chart(fig_trend)
 
-            # Tworzymy wydatki miesięczne
-            monthly_trend = trend_df.copy()
-            monthly_summary = monthly_trend.groupby(['month_str', 'month_polish'])['amount'].sum().reset_index()
-            monthly_summary = monthly_summary.sort_values('month_str')
+            # Tworzymy wydatki miesięczne (sumy z bazy)
+            monthly_summary = monthly_frame()
 
-            fig_monthly = px.line(monthly_summary,
+            fig_monthly = line_chart(monthly_summary,
                                   x='month_polish',
                                   y='amount',
                                   title='Łączne wydatki w poszczególnych miesiącach',
@@ -546,7 +584,7 @@ def main():
         # Wywołujemy funkcje i tworzymy wykres
         avg_df = average_monthly_expense_by_category()
         if avg_df is not None and not avg_df.empty:
-            fig_avg = px.bar(
+            fig_avg = bar_chart(
                 avg_df,
                 x='Kategoria',
                 y='Średni wydatek (zł)',
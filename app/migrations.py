@@ -0,0 +1,262 @@
+# Wersjonowane migracje schematu bazy (playhouse.migrate)
+# Zastosowane wersje zapisujemy w tabeli schema_version, więc każda migracja wykonuje się raz
+# Nowe zmiany schematu dopisujemy na końcu listy MIGRATIONS z kolejnym numerem wersji
+import logging
+import threading
+from datetime import datetime
+from peewee import (Model, IntegerField, BigIntegerField, CharField, FloatField, DateField, DateTimeField,
+                    BooleanField, ForeignKeyField, CompositeKey, PostgresqlDatabase, fn)
+from playhouse.migrate import SchemaMigrator, migrate as run_operations
+from database import month_expression
+from colors import PASTEL_COLORS
+from palette import ColorAllocator
+
+logger = logging.getLogger(__name__)
+
+
+# Tabela z historią zastosowanych migracji
+class SchemaVersion(Model):
+    version = IntegerField(primary_key=True)
+    description = CharField()
+    applied_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        table_name = 'schema_version'
+
+
+# Zamrożony schemat z wersji 1 - migracje nie mogą zależeć od bieżących modeli,
+# bo te zmieniają się razem z kolejnymi migracjami
+class V1Category(Model):
+    name = CharField(unique=True)
+    color = CharField(unique=True)
+    is_active = BooleanField(default=True)
+
+    class Meta:
+        table_name = 'category'
+
+class V1Expense(Model):
+    amount = FloatField()
+    category = CharField()
+    date = DateField()
+
+    class Meta:
+        table_name = 'expense'
+
+class V1ExpenseMonthlySummary(Model):
+    year_month = CharField(max_length=7)
+    category = CharField()
+    total = FloatField(column_name='sum', default=0)
+    count = IntegerField(default=0)
+
+    class Meta:
+        table_name = 'expense_monthly_summary'
+        primary_key = CompositeKey('year_month', 'category')
+
+class V1ImportManifest(Model):
+    path = CharField(unique=True)
+    size = BigIntegerField()
+    mtime = FloatField()
+    content_hash = CharField()
+    imported_at = DateTimeField(null=True)
+    imported_count = IntegerField(default=0)
+
+    class Meta:
+        table_name = 'importmanifest'
+
+V1_MODELS = [V1Category, V1Expense, V1ExpenseMonthlySummary, V1ImportManifest]
+
+
+# Zamrożony schemat z wersji 4: kategoria wydatku jako klucz obcy, kwoty jeszcze w złotych (float)
+class V4Expense(Model):
+    amount = FloatField()
+    category = ForeignKeyField(V1Category, index=False)
+    date = DateField()
+
+    class Meta:
+        table_name = 'expense'
+
+class V4ExpenseMonthlySummary(Model):
+    year_month = CharField(max_length=7)
+    category = ForeignKeyField(V1Category, on_delete='CASCADE')
+    total = FloatField(column_name='sum', default=0)
+    count = IntegerField(default=0)
+
+    class Meta:
+        table_name = 'expense_monthly_summary'
+        primary_key = CompositeKey('year_month', 'category')
+
+V4_MODELS = [V4Expense, V4ExpenseMonthlySummary]
+
+
+# Zamrożony schemat z wersji 5: kwoty w całkowitych groszach
+class V5Expense(Model):
+    amount = BigIntegerField()
+    category = ForeignKeyField(V1Category, index=False)
+    date = DateField()
+
+    class Meta:
+        table_name = 'expense'
+
+class V5ExpenseMonthlySummary(Model):
+    year_month = CharField(max_length=7)
+    category = ForeignKeyField(V1Category, on_delete='CASCADE')
+    total = BigIntegerField(column_name='sum', default=0)
+    count = IntegerField(default=0)
+
+    class Meta:
+        table_name = 'expense_monthly_summary'
+        primary_key = CompositeKey('year_month', 'category')
+
+V5_MODELS = [V5Expense, V5ExpenseMonthlySummary]
+
+
+# Migracja 1: tabele (dla istniejących baz tworzy tylko brakujące)
+def create_tables(migrator, models):
+    migrator.database.create_tables(V1_MODELS, safe=True)
+
+# Migracja 2: indeksy pod filtrowanie i sortowanie po dacie oraz kategorii
+# (category, date) obsługuje też same filtry i usuwanie po kategorii
+def add_expense_indexes(migrator, models):
+    run_operations(
+        migrator.add_index('expense', ('date',), False),
+        migrator.add_index('expense', ('category', 'date'), False),
+        migrator.add_index('expense_monthly_summary', ('category',), False),
+    )
+
+# Migracja 3: wypełnienie podsumowania miesięcznego dla baz, które miały już wydatki
+def fill_monthly_summary(migrator, models):
+    month = month_expression(V1Expense.date)
+    query = (V1Expense
+             .select(month, V1Expense.category, fn.SUM(V1Expense.amount), fn.COUNT(V1Expense.id))
+             .group_by(month, V1Expense.category))
+    summary = V1ExpenseMonthlySummary
+    summary.delete().execute()
+    summary.insert_from(query, [summary.year_month, summary.category, summary.total, summary.count]).execute()
+
+# Migracja 4: expense.category (nazwa) -> expense.category_id (klucz obcy do category)
+# Brakujące kategorie dodajemy, id przepisujemy jednym UPDATE, a podsumowanie miesięczne
+# (też kluczowane teraz po category_id) tworzymy od nowa
+def normalize_expense_category(migrator, models):
+    database = migrator.database
+    missing = (V1Expense
+               .select(V1Expense.category)
+               .distinct()
+               .where(V1Expense.category.not_in(V1Category.select(V1Category.name)))
+               .tuples())
+    names = [name for (name,) in missing]
+    if names:
+        # Kolory jak przy dodawaniu kategorii: przypisany w PASTEL_COLORS, jeśli wolny, inaczej kolejny z palety
+        allocator = ColorAllocator(color for (color,) in V1Category.select(V1Category.color).tuples())
+        rows = []
+        for name in names:
+            color = PASTEL_COLORS.get(name)
+            if color is None or not allocator.reserve(color):
+                color = allocator.allocate()
+            rows.append({"name": name, "color": color, "is_active": True})
+        V1Category.insert_many(rows).execute()
+
+    run_operations(migrator.add_column(
+        'expense', 'category_id', ForeignKeyField(V1Category, field=V1Category.id, null=True, index=False)))
+    database.execute_sql(
+        "UPDATE expense SET category_id = (SELECT category.id FROM category WHERE category.name = expense.category)")
+    run_operations(
+        migrator.drop_index('expense', 'expense_category_date'),
+        migrator.drop_column('expense', 'category'),
+        migrator.add_not_null('expense', 'category_id'),
+        migrator.add_index('expense', ('category_id', 'date'), False),
+    )
+
+    database.drop_tables([V1ExpenseMonthlySummary])
+    database.create_tables([V4ExpenseMonthlySummary])
+    month = month_expression(V4Expense.date)
+    query = (V4Expense
+             .select(month, V4Expense.category, fn.SUM(V4Expense.amount), fn.COUNT(V4Expense.id))
+             .group_by(month, V4Expense.category))
+    summary = V4ExpenseMonthlySummary
+    summary.insert_from(query, [summary.year_month, summary.category, summary.total, summary.count]).execute()
+
+
+# Migracja 5: kwoty jako całkowite grosze (BIGINT) zamiast złotych we float
+# Nowa kolumna, przeliczenie jednym UPDATE, podmiana kolumn; podsumowanie przeliczamy od nowa
+def amounts_to_grosze(migrator, models):
+    database = migrator.database
+    run_operations(migrator.add_column('expense', 'amount_grosze', BigIntegerField(null=True)))
+    # Zaokrąglamy jak to_grosze (połówki od zera, bez błędu reprezentacji floatu: 1.005 -> 101 groszy)
+    if isinstance(database, PostgresqlDatabase):
+        # float -> numeric w Postgresie bierze 15 cyfr znaczących, a ROUND na numeric zaokrągla połówki od zera
+        grosze = "ROUND(CAST(amount AS NUMERIC) * 100)"
+    else:
+        # SQLite nie ma dokładnego typu NUMERIC - przez tekst (15 cyfr znaczących) odcinamy błąd floatu
+        grosze = "ROUND(CAST(CAST(amount * 100 AS TEXT) AS REAL))"
+    database.execute_sql(f"UPDATE expense SET amount_grosze = CAST({grosze} AS BIGINT)")
+    run_operations(
+        migrator.drop_column('expense', 'amount'),
+        migrator.rename_column('expense', 'amount_grosze', 'amount'),
+        migrator.add_not_null('expense', 'amount'),
+    )
+
+    database.drop_tables([V4ExpenseMonthlySummary])
+    database.create_tables([V5ExpenseMonthlySummary])
+    month = month_expression(V5Expense.date)
+    query = (V5Expense
+             .select(month, V5Expense.category, fn.SUM(V5Expense.amount), fn.COUNT(V5Expense.id))
+             .group_by(month, V5Expense.category))
+    summary = V5ExpenseMonthlySummary
+    summary.insert_from(query, [summary.year_month, summary.category, summary.total, summary.count]).execute()
+
+
+# Migracja 6: indeks (date, id) pod stronicowanie po kluczu w zarządzaniu wydatkami
+# Zastępuje indeks na samej dacie (ten sam prefiks), więc nie dokładamy kosztu przy zapisach
+def add_expense_page_index(migrator, models):
+    run_operations(
+        migrator.drop_index('expense', 'expense_date'),
+        migrator.add_index('expense', ('date', 'id'), False),
+    )
+
+
+# Lista migracji: (wersja, opis, funkcja(migrator, modele))
+MIGRATIONS = [
+    (1, "tabele modeli", create_tables),
+    (2, "indeksy expense(date), expense(category, date), expense_monthly_summary(category)", add_expense_indexes),
+    (3, "wypełnienie expense_monthly_summary", fill_monthly_summary),
+    (4, "expense.category -> expense.category_id (klucz obcy do category)", normalize_expense_category),
+    (5, "expense.amount w groszach (BIGINT)", amounts_to_grosze),
+    (6, "indeks expense(date, id) zamiast expense(date)", add_expense_page_index),
+]
+
+# Bazy już zmigrowane w tym procesie - kolejne przebiegi Streamlit nie pytają bazy o wersję
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def current_version(database):
+    with database.bind_ctx([SchemaVersion]):
+        if not SchemaVersion.table_exists():
+            return 0
+        return SchemaVersion.select(fn.MAX(SchemaVersion.version)).scalar() or 0
+
+
+def migrate(database, models):
+    # Stosujemy brakujące migracje (każdą w osobnej transakcji) i zwracamy ich liczbę
+    # models to klasy modeli, np. BaseModel.__subclasses__() - szukamy ich po nazwie klasy
+    with _migrate_lock:
+        if id(database) in _migrated:
+            return 0
+
+        models = {model.__name__: model for model in models}
+        applied = 0
+        with database.bind_ctx(list(models.values()) + V1_MODELS + V4_MODELS + V5_MODELS + [SchemaVersion]):
+            database.create_tables([SchemaVersion], safe=True)
+            version = current_version(database)
+            migrator = SchemaMigrator.from_database(database)
+            for number, description, step in MIGRATIONS:
+                if number <= version:
+                    continue
+                with database.atomic():
+                    step(migrator, models)
+                    SchemaVersion.create(version=number, description=description)
+                logger.info(f"Zastosowano migrację {number}: {description}")
+                applied += 1
+
+        _migrated.add(id(database))
+        return applied
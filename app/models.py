@@ -1,91 +1,71 @@
 import os
+import threading
+import weakref
+from collections import namedtuple
+import pandas as pd
 from peewee import *
 from datetime import datetime
-from database import db
+from database import db, month_expression, supports_returning
 from colors import PASTEL_COLORS
+from palette import ColorAllocator
+from money import to_grosze, to_zloty, series_to_grosze
 
 # Wybieramy bazę danych w zależności od trybu
 if os.environ.get("TEST_MODE") == "True":
     # Baza w pamięci dla testów (ulotna, szybka)
     db = SqliteDatabase(":memory:")
-else:
-    # db = SqliteDatabase("mybudget.db")
-    # Lokalna baza Postgres do normalnego działania
-    db = PostgresqlDatabase(
-        os.getenv('POSTGRES_DB', 'mybudgetdb'),
-        user=os.getenv('POSTGRES_USER', 'postgres'),
-        password=os.getenv('POSTGRES_PASSWORD', 'postgres'),
-        host=os.getenv('POSTGRES_HOST', 'db'),
-        port=int(os.getenv('POSTGRES_PORT', '5432')),
-    )
+# Poza testami modele używają bazy z database.py (Postgres z pulą połączeń)
 
-# Klasa bazowa dla wszystkich modeli (Expense, Category)
-class BaseModel(Model):
-    class Meta:
-        # Każdy model używa tej samej bazy danych
-        database = db
+# Licznik wersji danych - zwiększany przez każdą metodę zapisującą Expense i Category
+# Widok (st.cache_data) używa go jako klucza, więc przy niezmienionych danych nie pyta bazy wcale
+DATA_VERSION = {"value": 0}
+_data_version_lock = threading.Lock()
 
-# Model reprezentujący pojedynczy wydatek
-class Expense(BaseModel):
-    # Kwota wydatku
-    amount = FloatField()
-    # Nazwa kategorii (string)
-    category = CharField()
-    # Data wydatku (domyślnie dzisiejsza)
-    date = DateField(default=datetime.now().date)
+def data_version():
+    return DATA_VERSION["value"]
 
-    @classmethod
-    def create_expense(cls, amount, category, date=None):
-        # Walidacja: czy kategoria istnieje i jest aktywna
-        if not Category.get_or_none(Category.name == category):
-            raise ValueError(f"Kategoria '{category}' nie istnieje lub została usunięta")
-        # Walidacja: kwota musi być dodatnia
-        if amount <= 0:
-            raise ValueError("Kwota wydatku musi być większa od 0")
-        # Jeśli data nie jest podana ustaw dzisiejszą
-        if date is None:
-            date = datetime.now().date()
-        # Tworzymy wpis w bazie
-        return cls.create(amount=amount, category=category, date=date)
+def bump_data_version():
+    with _data_version_lock:
+        DATA_VERSION["value"] += 1
+        return DATA_VERSION["value"]
 
-    @classmethod
-    def get_all(cls):
-        # Pobieramy wszystkie wydatki posortowane malejąco po dacie
-        return list(cls.select().order_by(cls.date.desc()))
+# Klucz miesiąca 'RRRR-MM' dla daty po stronie Pythona (date, datetime lub tekst '2024-05-01')
+def month_key(value):
+    return str(value)[:7]
 
-    @classmethod
-    def get_by_id(cls, id):
-        # Pobieramy wydatek po ID lub None jeśli nie istnieje
-        try:
-            return cls.get(cls.id == id)
-        except DoesNotExist:
+# Kwota pieniężna: w bazie całkowite grosze (BIGINT), w Pythonie złote
+# Agregaty (SUM, AVG) liczone są w SQL na liczbach całkowitych i zamieniane na złote dopiero w wyniku
+class MoneyField(BigIntegerField):
+    def db_value(self, value):
+        if value is None:
             return None
+        return super().db_value(to_grosze(value))
 
-    @classmethod
-    def update_expense(cls, id, **kwargs):
-        # Aktualizacja wydatku po ID
-        query = cls.update(**kwargs).where(cls.id == id)
-        updated = query.execute()
-        # UPDATE expense SET amount = 200 WHERE id = 999999999;
-        # Jeśli nie ma rekordu o takim id to zwraca 0 rows affected
-        # Zwracamy nową wersję wpisu jeśli coś się zmieniło, w przeciwnym razie None
-        return cls.get_by_id(id) if updated else None
+    def python_value(self, value):
+        return None if value is None else to_zloty(value)
 
-    @classmethod
-    def delete_expense(cls, id):
-        # Usunięcie wydatku po ID
-        query = cls.delete().where(cls.id == id)
-        deleted = query.execute()
-        # Zwracamy nową wersję wpisu jeśli coś się zmieniło, w przeciwnym razie None
-        return cls.get_by_id(id) if deleted else None
+# SUM i AVG kwot: liczone w SQL na groszach, wynik zamieniany na złote
+# (peewee nie konwertuje wyników SUM przez pole, więc podajemy konwersję jawnie)
+def money_sum(field):
+    return fn.SUM(field).coerce(True).python_value(to_zloty)
 
-    @classmethod
-    def category_summary(cls):
-        # Sumowanie wydatków według kategorii
-        query = (cls
-                 .select(cls.category, fn.SUM(cls.amount).alias('total'))
-                 .group_by(cls.category))
-        return list(query)
+def money_avg(field):
+    return fn.AVG(field).coerce(True).python_value(to_zloty)
+
+# Liczba wydatków w jednej porcji zapisów zbiorczych (update_many, delete_many) - jedno zapytanie na porcję
+WRITE_BATCH_SIZE = 500
+# Liczba wydatków w jednym INSERT-cie przy tworzeniu wielu wydatków (create_many)
+INSERT_BATCH_SIZE = 1000
+
+# Przydział kolorów kategorii - jeden na bazę danych w procesie, zasilany jej kolorami przy pierwszym użyciu
+_color_allocators = weakref.WeakKeyDictionary()
+_color_allocators_lock = threading.Lock()
+
+# Klasa bazowa dla wszystkich modeli (Expense, Category)
+class BaseModel(Model):
+    class Meta:
+        # Każdy model używa tej samej bazy danych
+        database = db
 
 # Model reprezentujący kategorię wydatków
 class Category(BaseModel):
@@ -97,28 +77,114 @@ class Category(BaseModel):
     # Flaga aktywności (można dezaktywować kategorię)
     is_active = BooleanField(default=True)
 
+    # Każdy zapis i usunięcie kategorii (dodanie, aktywacja, dezaktywacja) zmienia wersję danych
+    # i unieważnia rejestr kategorii - dopiero po zatwierdzeniu transakcji, żeby inna sesja nie wczytała
+    # rejestru od nowa ze stanem sprzed zapisu (wtedy zostałby nieaktualny)
+    # Wywołujący, którzy trzymają własną transakcję, unieważniają rejestr jeszcze raz po jej zatwierdzeniu
+    def save(self, *args, **kwargs):
+        with self._meta.database.atomic():
+            result = super().save(*args, **kwargs)
+        CategoryRegistry.invalidate()
+        bump_data_version()
+        return result
+
+    def delete_instance(self, *args, **kwargs):
+        with self._meta.database.atomic():
+            deleted = super().delete_instance(*args, **kwargs)
+        CategoryRegistry.invalidate()
+        bump_data_version()
+        return deleted
+
+    @classmethod
+    def color_allocator(cls, reseed=False):
+        # Przydział kolorów dla bazy, do której podpięty jest model
+        # Zajęte kolory pobieramy z bazy raz, potem przydział ich pilnuje sam (bez zapytań przy każdej kategorii)
+        # reseed=True wczytuje je od nowa (np. gdy inny proces zapisał kategorie z nowymi kolorami)
+        database = cls._meta.database
+        with _color_allocators_lock:
+            allocator = _color_allocators.get(database)
+            if allocator is None or reseed:
+                allocator = ColorAllocator(color for (color,) in cls.select(cls.color).tuples())
+                _color_allocators[database] = allocator
+            return allocator
+
     @classmethod
     def create_category(cls, name, color=None):
-        # Jeśli kategoria istnieje w PASTEL_COLORS, użyj przypisanego koloru
-        if name in PASTEL_COLORS:
-            color = PASTEL_COLORS[name]
-        else:
-            # W przeciwnym razie losujemy unikalny pastelowy kolor
-            used_colors = [c.color for c in cls.get_all_categories()]
-            if color is None:
-                color = cls.generate_unique_color(used_colors)
-        return cls.create(name=name, color=color, is_active=True)
-
-    # Generator losowych pastelowych kolorów
+        # Jeśli kolor wylosowany z palety zajął w międzyczasie inny proces (unikalny kolor),
+        # wczytujemy zajęte kolory z bazy od nowa i próbujemy jeszcze raz
+        for attempt in range(2):
+            allocator = cls.color_allocator(reseed=attempt > 0)
+            # Jeśli kategoria istnieje w PASTEL_COLORS, użyj przypisanego koloru
+            if name in PASTEL_COLORS:
+                category_color = PASTEL_COLORS[name]
+            elif color is None:
+                # W przeciwnym razie bierzemy kolejny wolny pastelowy kolor z palety
+                category_color = allocator.allocate()
+            else:
+                category_color = color
+                allocator.reserve(color)
+            try:
+                with cls._meta.database.atomic():
+                    category = cls.create(name=name, color=category_color, is_active=True)
+            except IntegrityError:
+                if attempt or name in PASTEL_COLORS or color is not None:
+                    raise
+                continue
+            # Rejestr unieważniamy po zatwierdzeniu zapisu
+            CategoryRegistry.invalidate()
+            bump_data_version()
+            return category
+
+    @classmethod
+    def create_categories(cls, names):
+        # Tworzymy wiele kategorii naraz (np. po imporcie) jednym INSERT-em
+        # Nazwy z PASTEL_COLORS dostają swój kolor, o ile nie używa go już inna kategoria (jedno zapytanie),
+        # pozostałe - kolejne kolory z palety
+        names = list(names)
+        presets = {PASTEL_COLORS[name] for name in names if name in PASTEL_COLORS}
+        for attempt in range(2):
+            allocator = cls.color_allocator(reseed=attempt > 0)
+            taken = {color for (color,) in cls.select(cls.color).where(cls.color.in_(presets)).tuples()} if presets else set()
+            colors = {}
+            for name in names:
+                color = PASTEL_COLORS.get(name)
+                if color is not None and color not in taken:
+                    colors[name] = color
+                    taken.add(color)
+            # Kolory z palety dla wszystkich pozostałych nazw przydzielamy naraz
+            others = [name for name in names if name not in colors]
+            colors.update(zip(others, allocator.allocate_many(len(others))))
+            rows = [{"name": name, "color": colors[name], "is_active": True} for name in names]
+
+            try:
+                with cls._meta.database.atomic():
+                    for batch in chunked(rows, 100):
+                        cls.insert_many(batch).execute()
+                break
+            except IntegrityError:
+                # Kolor z palety mógł zająć inny proces - wczytujemy zajęte kolory od nowa
+                if attempt:
+                    raise
+        if rows:
+            CategoryRegistry.invalidate()
+            bump_data_version()
+        return len(rows)
+
+    @classmethod
+    def ids_for_names(cls, names):
+        # Zamieniamy nazwy kategorii na id jednym zapytaniem; brakujące kategorie dodajemy (jak przy imporcie)
+        names = set(names)
+        ids = dict(cls.select(cls.name, cls.id).where(cls.name.in_(names)).tuples()) if names else {}
+        missing = sorted(names - set(ids))
+        if missing:
+            cls.create_categories(missing)
+            ids.update(cls.select(cls.name, cls.id).where(cls.name.in_(missing)).tuples())
+        return ids
+
+    # Pierwszy wolny pastelowy kolor z palety względem podanych zajętych kolorów
     @staticmethod
     def generate_unique_color(used_colors):
-        import random
-        while True:
-            r = lambda: random.randint(128, 255)
-            color = f'#{r():02X}{r():02X}{r():02X}'
-            # Sprawdzamy czy kolor już nie istnieje
-            if color not in used_colors:
-                return color
+        return ColorAllocator(used_colors).allocate()
 
     # Pobramy wszystkie kategorie
     @classmethod
@@ -133,10 +199,15 @@ class Category(BaseModel):
             if not cat:
                 return False
 
-            # Najpierw usuwamy wszystkie wydatki w tej kategorii
-            Expense.delete().where(Expense.category == name).execute()
-            # Potem usuwamy kategorie
-            cat.delete_instance()
+            with cls._meta.database.atomic():
+                # Najpierw usuwamy wszystkie wydatki w tej kategorii (i ich podsumowanie miesięczne) - po id
+                Expense.delete().where(Expense.category == cat).execute()
+                ExpenseMonthlySummary.delete().where(ExpenseMonthlySummary.category == cat).execute()
+                # Potem usuwamy kategorie
+                cat.delete_instance()
+            # Unieważniamy rejestr jeszcze raz po zatwierdzeniu transakcji
+            CategoryRegistry.invalidate()
+            bump_data_version()
             return True
         except Exception as e:
             print("Błąd usuwania kategorii:", e)
@@ -152,12 +223,431 @@ class Category(BaseModel):
             return True
         return False
 
+    @classmethod
+    def activate_category(cls, name):
+        # Aktywacja kategorii (ustawienie is_active=True)
+        cat = cls.get_or_none(cls.name == name)
+        if cat and not cat.is_active:
+            cat.is_active = True
+            cat.save()
+            return True
+        return False
+
     @classmethod
     def get_active_categories(cls):
         # Pobieramy wszystkie aktywne kategorie
         return cls.select().where(cls.is_active == True)
 
+# Dane kategorii trzymane w rejestrze: id, kolor i flaga aktywności
+CategoryInfo = namedtuple('CategoryInfo', ['id', 'color', 'is_active'])
+
+# Rejestr kategorii w pamięci procesu, wspólny dla wszystkich sesji Streamlit
+# Wszystkie kategorie (nazwa -> CategoryInfo) wczytujemy jednym zapytaniem, a widoki pytają słownik
+# zamiast bazy o każdą kategorię osobno; każdy zapis kategorii (Category.save, delete_instance,
+# create_categories) unieważnia rejestr, więc następny odczyt wczytuje go od nowa
+class CategoryRegistry:
+    _entries = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def entries(cls):
+        # Słownik nazwa -> CategoryInfo w kolejności dodania kategorii
+        entries = cls._entries
+        if entries is None:
+            with cls._lock:
+                if cls._entries is None:
+                    query = Category.select(Category.name, Category.id, Category.color, Category.is_active).order_by(Category.id)
+                    cls._entries = {name: CategoryInfo(id, color, is_active) for name, id, color, is_active in query.tuples()}
+                entries = cls._entries
+        return entries
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._entries = None
+
+    @classmethod
+    def get(cls, name):
+        # CategoryInfo kategorii lub None, jeśli jej nie ma
+        return cls.entries().get(name)
+
+    @classmethod
+    def names(cls, active_only=False):
+        return [name for name, info in cls.entries().items() if info.is_active or not active_only]
+
+    @classmethod
+    def color_map(cls, names=None):
+        # Kolory kategorii {nazwa: kolor}; dla podanych nazw tylko tych, które istnieją
+        entries = cls.entries()
+        if names is None:
+            names = entries
+        return {name: entries[name].color for name in names if name in entries}
+
+# Model reprezentujący pojedynczy wydatek
+class Expense(BaseModel):
+    # Kwota wydatku (w bazie w groszach)
+    amount = MoneyField()
+    # Kategoria (klucz obcy - w tabeli tylko id, nazwa jest w Category)
+    # Indeks (category_id, date) zakłada migracja
+    category = ForeignKeyField(Category, backref='expenses', index=False)
+    # Data wydatku (domyślnie dzisiejsza)
+    date = DateField(default=datetime.now().date)
+
+    # Każdy zapis pojedynczego wydatku aktualizuje podsumowanie miesięczne w tej samej transakcji
+    # (dotyczy też Expense.create i edycji przez save())
+    def save(self, *args, **kwargs):
+        with self._meta.database.atomic():
+            old = None
+            if self.id is not None and not kwargs.get('force_insert'):
+                old = type(self).get_by_id(self.id)
+            result = super().save(*args, **kwargs)
+            if result:
+                if old is not None:
+                    ExpenseMonthlySummary.apply(old.date, old.category_id, -old.amount, -1)
+                ExpenseMonthlySummary.apply(self.date, self.category_id, self.amount, 1)
+        if result:
+            bump_data_version()
+        return result
+
+    def delete_instance(self, *args, **kwargs):
+        with self._meta.database.atomic():
+            deleted = super().delete_instance(*args, **kwargs)
+            if deleted:
+                ExpenseMonthlySummary.apply(self.date, self.category_id, -self.amount, -1)
+        if deleted:
+            bump_data_version()
+        return deleted
+
+    @classmethod
+    def create_expense(cls, amount, category, date=None):
+        # Walidacja: czy kategoria istnieje i jest aktywna
+        # Pobrana kategoria od razu daje id do zapisu
+        category_obj = Category.get_or_none(Category.name == category)
+        if not category_obj:
+            raise ValueError(f"Kategoria '{category}' nie istnieje lub została usunięta")
+        # Walidacja: kwota musi być dodatnia (po zaokrągleniu do groszy)
+        if to_grosze(amount) <= 0:
+            raise ValueError("Kwota wydatku musi być większa od 0")
+        # Jeśli data nie jest podana ustaw dzisiejszą
+        if date is None:
+            date = datetime.now().date()
+        # Tworzymy wpis w bazie
+        return cls.create(amount=amount, category=category_obj, date=date)
+
+    @classmethod
+    def create_many(cls, rows):
+        # Tworzenie wielu wydatków z walidacją jak w create_expense, ale zbiorczo:
+        # kategorie sprawdzamy jednym zapytaniem, kwoty i daty wektorowo (pandas), a poprawne wiersze
+        # zapisujemy insert_many porcjami po INSERT_BATCH_SIZE w jednej transakcji
+        # rows: lista słowników {"amount", "category", "date" (opcjonalnie)}
+        # Zwracamy {"created": liczba zapisanych, "errors": [(numer wiersza, komunikat), ...]}
+        rows = list(rows)
+        stats = {"created": 0, "errors": []}
+        if not rows:
+            return stats
+
+        frame = pd.DataFrame({
+            "amount": pd.to_numeric(pd.Series([row.get("amount") for row in rows], dtype=object), errors="coerce"),
+            "category": [row.get("category") for row in rows],
+            "date": [row.get("date") for row in rows],
+        })
+        names = {name for name in frame["category"].dropna().unique()}
+        category_ids = dict(Category.select(Category.name, Category.id).where(Category.name.in_(names)).tuples()) if names else {}
+        frame["category_id"] = frame["category"].map(category_ids)
+        # Grosze liczymy tą samą regułą co MoneyField (to_grosze: 1.005 -> 1.01 zł), żeby zapis zbiorczy
+        # i pojedynczy dawały tę samą kwotę
+        frame["grosze"] = series_to_grosze(frame["amount"].fillna(0))
+        # Brak daty oznacza dzisiejszą (jak w create_expense)
+        today = datetime.now().date()
+        parsed_dates = pd.to_datetime(frame["date"], errors="coerce")
+        frame["parsed_date"] = [today if raw is None else (None if pd.isna(parsed) else parsed.date())
+                                for raw, parsed in zip(frame["date"], parsed_dates)]
+
+        # Walidacja wszystkich wierszy naraz; pierwszy błąd wiersza trafia do raportu
+        checks = [
+            (frame["category_id"].isna(), lambda row: f"Kategoria '{row.category}' nie istnieje lub została usunięta"),
+            (frame["amount"].isna(), lambda row: "Niepoprawna kwota wydatku"),
+            (frame["grosze"] <= 0, lambda row: "Kwota wydatku musi być większa od 0"),
+            (frame["parsed_date"].isna(), lambda row: f"Niepoprawna data wydatku: {row.date}"),
+        ]
+        invalid = pd.Series(False, index=frame.index)
+        for mask, message in checks:
+            new_errors = mask & ~invalid
+            for row in frame[new_errors].itertuples():
+                stats["errors"].append((row.Index, message(row)))
+            invalid |= mask
+        stats["errors"].sort()
+
+        valid = frame[~invalid]
+        if valid.empty:
+            return stats
+        records = [{"amount": to_zloty(grosze), "category": int(category_id), "date": day}
+                   for grosze, category_id, day in zip(valid["grosze"], valid["category_id"], valid["parsed_date"])]
+
+        # Podsumowanie miesięczne korygujemy zbiorczo, tak jak przy update_many
+        deltas = {}
+        for record, grosze in zip(records, valid["grosze"]):
+            delta = deltas.setdefault((month_key(record["date"]), record["category"]), [0, 0])
+            delta[0] += int(grosze)
+            delta[1] += 1
+
+        with cls._meta.database.atomic():
+            for batch in chunked(records, INSERT_BATCH_SIZE):
+                cls.insert_many(batch).execute()
+            ExpenseMonthlySummary.apply_many(deltas)
+        bump_data_version()
+        stats["created"] = len(records)
+        return stats
+
+    @classmethod
+    def get_all(cls):
+        # Pobieramy wszystkie wydatki posortowane malejąco po dacie
+        return list(cls.select().order_by(cls.date.desc()))
+
+    @classmethod
+    def page(cls, after=None, limit=50, date_from=None, date_to=None, category=None,
+             min_amount=None, max_amount=None):
+        # Jedna strona wydatków od najnowszych, posortowana po (date desc, id desc)
+        # Stronicujemy po kluczu zamiast OFFSET: after to (data, id) ostatniego wiersza poprzedniej strony,
+        # więc baza zaczyna od miejsca w indeksie (date, id) i koszt strony nie zależy od liczby wydatków
+        # Wszystkie filtry trafiają do WHERE; kategorię podajemy nazwą, kwoty w złotych
+        # Zwracamy (lista wydatków z dołączoną kategorią, czy jest następna strona)
+        query = cls.select(cls, Category).join(Category)
+        if after is not None:
+            after_date, after_id = after
+            query = query.where(Tuple(cls.date, cls.id) < Tuple(after_date, after_id))
+        if date_from is not None:
+            query = query.where(cls.date >= date_from)
+        if date_to is not None:
+            query = query.where(cls.date <= date_to)
+        if category is not None:
+            # Nazwę kategorii zamieniamy na id z rejestru; nieistniejąca kategoria nie ma wydatków
+            info = CategoryRegistry.get(category)
+            if info is None:
+                return [], False
+            query = query.where(cls.category == info.id)
+        if min_amount is not None:
+            query = query.where(cls.amount >= min_amount)
+        if max_amount is not None:
+            query = query.where(cls.amount <= max_amount)
+        # Pobieramy jeden wiersz więcej, żeby wiedzieć, czy istnieje następna strona
+        expenses = list(query.order_by(cls.date.desc(), cls.id.desc()).limit(limit + 1))
+        return expenses[:limit], len(expenses) > limit
+
+    @classmethod
+    def get_by_id(cls, id):
+        # Pobieramy wydatek po ID lub None jeśli nie istnieje
+        try:
+            return cls.get(cls.id == id)
+        except DoesNotExist:
+            return None
+
+    @classmethod
+    def update_expense(cls, id, **kwargs):
+        # Aktualizacja wydatku po ID (zbiorcza aktualizacja dla jednego ID)
+        # UPDATE expense SET amount = 200 WHERE id = 999999999;
+        # Jeśli nie ma rekordu o takim id to zwraca 0 rows affected
+        updated = cls.update_many([id], **kwargs)
+        # Zwracamy nową wersję wpisu jeśli coś się zmieniło, w przeciwnym razie None
+        return updated[0] if updated else None
+
+    @classmethod
+    def delete_expense(cls, id):
+        # Usunięcie wydatku po ID - wiersz nie istnieje po usunięciu, więc nie czytamy go ponownie
+        cls.delete_many([id])
+        return None
+
+    @classmethod
+    def update_many(cls, ids, **fields):
+        # Ta sama zmiana (np. kategoria, data) dla wielu wydatków naraz
+        # Postgres: w każdej porcji jedno zapytanie UPDATE ... FROM (SELECT ... FOR UPDATE) old ... RETURNING,
+        # które zwraca stare wartości (do podsumowania miesięcznego) i nowe wiersze
+        # Inne bazy: jeden SELECT starych wierszy i jeden UPDATE ... RETURNING (bez RETURNING - SELECT po UPDATE)
+        # Kategorię można podać nazwą - musi istnieć (jak w create_expense); zwracamy listę zaktualizowanych wydatków
+        ids = list(dict.fromkeys(ids))
+        if not ids or not fields:
+            return []
+        if isinstance(fields.get('category'), str):
+            category = Category.get_or_none(Category.name == fields['category'])
+            if not category:
+                raise ValueError(f"Kategoria '{fields['category']}' nie istnieje lub została usunięta")
+            fields['category'] = category
+
+        database = cls._meta.database
+        deltas = {}
+        updated = []
+        with database.atomic():
+            for batch in chunked(ids, WRITE_BATCH_SIZE):
+                if isinstance(database, PostgresqlDatabase):
+                    new_rows = list(cls.update_returning_old(batch, fields).execute())
+                    # Stare wartości z podzapytania nie przechodzą przez konwersję pól - grosze zamieniamy sami
+                    old_rows = [cls(id=row.id, amount=to_zloty(row.old_amount), category=row.old_category_id,
+                                    date=row.old_date) for row in new_rows]
+                else:
+                    old_query = cls.select().where(cls.id.in_(batch))
+                    if database.for_update:
+                        old_query = old_query.for_update()
+                    old_rows = list(old_query)
+                    if not old_rows:
+                        continue
+                    query = cls.update(**fields).where(cls.id.in_(batch))
+                    if supports_returning(database):
+                        new_rows = list(query.returning(*cls._meta.sorted_fields).execute())
+                    else:
+                        query.execute()
+                        new_rows = list(cls.select().where(cls.id.in_(batch)))
+                # Przenosimy kwoty w podsumowaniu miesięcznym ze starych miesięcy/kategorii do nowych
+                ExpenseMonthlySummary.add_deltas(deltas, old_rows, -1)
+                ExpenseMonthlySummary.add_deltas(deltas, new_rows, 1)
+                updated.extend(new_rows)
+            ExpenseMonthlySummary.apply_many(deltas)
+        if updated:
+            bump_data_version()
+        return updated
+
+    @classmethod
+    def update_returning_old(cls, ids, fields):
+        # UPDATE expense SET ... FROM (SELECT ... FOR UPDATE) old WHERE expense.id = old.id RETURNING nowe i stare wartości
+        # Blokada wierszy, odczyt starych wartości i zapis w jednym zapytaniu (Postgres)
+        old = (cls
+               .select(cls.id, cls.amount, cls.category, cls.date)
+               .where(cls.id.in_(ids))
+               .for_update()
+               .alias('old'))
+        return (cls
+                .update(**fields)
+                .from_(old)
+                .where(cls.id == old.c.id)
+                .returning(*cls._meta.sorted_fields,
+                           old.c.amount.alias('old_amount'),
+                           old.c.category_id.alias('old_category_id'),
+                           old.c.date.alias('old_date')))
+
+    @classmethod
+    def delete_many(cls, ids):
+        # Usunięcie wielu wydatków: w każdej porcji jeden DELETE ... RETURNING, który zwraca dane
+        # usuniętych wierszy potrzebne do podsumowania miesięcznego (bez RETURNING - SELECT przed DELETE)
+        # Zwracamy listę usuniętych wydatków
+        ids = list(dict.fromkeys(ids))
+        database = cls._meta.database
+        deltas = {}
+        deleted = []
+        with database.atomic():
+            for batch in chunked(ids, WRITE_BATCH_SIZE):
+                query = cls.delete().where(cls.id.in_(batch))
+                if supports_returning(database):
+                    rows = list(query.returning(*cls._meta.sorted_fields).execute())
+                else:
+                    rows = list(cls.select().where(cls.id.in_(batch)))
+                    query.execute()
+                ExpenseMonthlySummary.add_deltas(deltas, rows, -1)
+                deleted.extend(rows)
+            ExpenseMonthlySummary.apply_many(deltas)
+        if deleted:
+            bump_data_version()
+        return deleted
+
+    @classmethod
+    def category_summary(cls):
+        # Sumowanie wydatków według kategorii - z podsumowania miesięcznego zamiast z całej tabeli wydatków
+        # Nazwy kategorii dołączamy jednym JOIN-em; wiersze mają pola category (nazwa) i total
+        summary = ExpenseMonthlySummary
+        query = (summary
+                 .select(Category.name.alias('category'), money_sum(summary.total).alias('total'))
+                 .join(Category)
+                 .group_by(Category.name)
+                 .namedtuples())
+        return list(query)
+
+# Podsumowanie wydatków w miesiącu i kategorii (suma i liczba wydatków)
+# Aktualizowane przy każdym zapisie wydatku, dzięki czemu wykresy nie skanują całej tabeli wydatków
+# Po imporcie masowym i w razie rozjazdu przeliczamy je od zera (rebuild)
+class ExpenseMonthlySummary(BaseModel):
+    # Miesiąc w formacie 'RRRR-MM'
+    year_month = CharField(max_length=7)
+    category = ForeignKeyField(Category, on_delete='CASCADE')
+    total = MoneyField(column_name='sum', default=0)
+    count = IntegerField(default=0)
+
+    class Meta:
+        table_name = 'expense_monthly_summary'
+        primary_key = CompositeKey('year_month', 'category')
+
+    @classmethod
+    def apply(cls, date, category_id, amount, count):
+        # Dodajemy (lub odejmujemy) kwotę i liczbę wydatków w danym miesiącu i kategorii jednym upsertem
+        (cls
+         .insert(year_month=month_key(date), category=category_id, total=amount, count=count)
+         .on_conflict(
+             conflict_target=[cls.year_month, cls.category],
+             update={cls.total: cls.total + EXCLUDED.sum, cls.count: cls.count + EXCLUDED.count})
+         .execute())
+        # Usuwamy puste wiersze (po usunięciu ostatniego wydatku w miesiącu)
+        if count < 0:
+            cls.delete().where((cls.year_month == month_key(date)) &
+                               (cls.category == category_id) &
+                               (cls.count <= 0)).execute()
+
+    @staticmethod
+    def add_deltas(deltas, expenses, sign):
+        # Zbieramy zmiany podsumowania: {(miesiąc, id kategorii): [grosze, liczba wydatków]}
+        # sign = 1 dla dodanych/nowych wierszy, -1 dla usuniętych/starych
+        for expense in expenses:
+            delta = deltas.setdefault((month_key(expense.date), expense.category_id), [0, 0])
+            delta[0] += sign * to_grosze(expense.amount)
+            delta[1] += sign
+
+    @classmethod
+    def apply_many(cls, deltas):
+        # Zmiany podsumowania dla wielu miesięcy i kategorii naraz: upserty porcjami po 100 wierszy
+        # Pary, które się znoszą (edycja bez zmiany miesiąca, kategorii i kwoty), pomijamy
+        rows = [{"year_month": year_month, "category": category_id, "total": to_zloty(grosze), "count": count}
+                for (year_month, category_id), (grosze, count) in deltas.items() if grosze or count]
+        for batch in chunked(rows, 100):
+            (cls
+             .insert_many(batch)
+             .on_conflict(
+                 conflict_target=[cls.year_month, cls.category],
+                 update={cls.total: cls.total + EXCLUDED.sum, cls.count: cls.count + EXCLUDED.count})
+             .execute())
+        # Usuwamy puste wiersze (po usunięciu ostatnich wydatków w miesiącu)
+        if any(row["count"] < 0 for row in rows):
+            cls.delete().where(cls.count <= 0).execute()
+
+    @classmethod
+    def rebuild(cls):
+        # Przeliczamy całe podsumowanie z tabeli wydatków (po imporcie masowym lub do naprawy)
+        month = month_expression(Expense.date)
+        query = (Expense
+                 .select(month, Expense.category, fn.SUM(Expense.amount), fn.COUNT(Expense.id))
+                 .group_by(month, Expense.category))
+        with cls._meta.database.atomic():
+            cls.delete().execute()
+            cls.insert_from(query, [cls.year_month, cls.category, cls.total, cls.count]).execute()
+        # Przeliczenie następuje po zapisach masowych (import), więc też zmienia wersję danych
+        bump_data_version()
+        return cls.select().count()
+
+# Model zapamiętujący ostatnio zaimportowany plik CSV (manifest importu)
+# Dzięki niemu import jest pomijany, jeśli plik się nie zmienił
+class ImportManifest(BaseModel):
+    # Ścieżka pliku (bezwzględna)
+    path = CharField(unique=True)
+    # Rozmiar pliku w bajtach i czas ostatniej modyfikacji
+    size = BigIntegerField()
+    mtime = FloatField()
+    # Skrót SHA-256 zawartości pliku
+    content_hash = CharField()
+    # Kiedy plik był ostatnio importowany i ile rekordów wtedy zaimportowano
+    imported_at = DateTimeField(null=True)
+    imported_count = IntegerField(default=0)
+
 
-# Inicjalizacja połączenia z bazą
+# Inicjalizacja połączenia z bazą i migracje schematu (tabele, indeksy)
+from migrations import migrate
 db.connect()
-db.create_tables([Expense, Category])
+migrate(db, [Expense, Category, ImportManifest, ExpenseMonthlySummary])
+# Połączenie z puli oddajemy od razu - przebiegi skryptu i wątki w tle pobierają własne
+# (baza SQLite w pamięci musi zostać otwarta, bo zamknięcie usunęłoby jej zawartość)
+if not isinstance(db, SqliteDatabase):
+    db.close()
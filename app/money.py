@@ -0,0 +1,28 @@
+# Kwoty pieniężne: w bazie trzymamy całkowite grosze, na zewnątrz (formularze, CSV, wykresy) złote
+# Sumy liczone na liczbach całkowitych są dokładne i powtarzalne, w przeciwieństwie do sum floatów
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+
+# Liczba groszy w złotym
+GROSZE = 100
+# Dokładność (miejsca po przecinku), do której zaokrąglamy grosze przed zaokrągleniem do całych przy zamianie wektorowej
+GROSZE_DECIMALS = 6
+
+
+def to_grosze(value):
+    # Złote (float, Decimal, tekst) -> całkowite grosze, zaokrąglenie do najbliższego grosza (połówki w górę)
+    # Przez str(), żeby np. 0.29 nie zamieniło się w 28.999... groszy
+    return int((Decimal(str(value)) * GROSZE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_zloty(grosze):
+    # Grosze (int, a w Postgresie SUM/AVG zwraca Decimal) -> złote jako float
+    return float(grosze) / GROSZE
+
+
+def series_to_grosze(values):
+    # Wektorowo: kwoty w złotych (kolumna pandas / tablica) -> tablica int64 groszy
+    # Ta sama reguła co to_grosze (połówki od zera): iloczyn x100 najpierw zaokrąglamy do GROSZE_DECIMALS miejsc,
+    # co usuwa błąd reprezentacji floatu (1.005 * 100 = 100.49999... -> 100.5), a potem do całych groszy
+    scaled = np.round(np.asarray(values, dtype=np.float64) * GROSZE, GROSZE_DECIMALS)
+    return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)).astype(np.int64)
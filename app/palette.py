@@ -0,0 +1,92 @@
+# Przydział kolorów dla nowych kategorii
+# Zamiast losować kolor aż trafimy na wolny, raz wyliczamy uporządkowaną paletę pastelowych kolorów
+# (kolejne odcienie co "złoty kąt", żeby sąsiednie kolory wyraźnie się różniły, w kilku poziomach jasności)
+# i wydajemy z niej kolejne wolne kolory - każda pozycja palety jest sprawdzana najwyżej raz
+import colorsys
+import threading
+from colors import PASTEL_COLORS
+
+# Liczba odcieni na jednym poziomie jasności/nasycenia
+HUES_PER_TIER = 256
+# Poziomy (jasność, nasycenie) w HLS - wszystkie dają kanały RGB w zakresie 128-255 (pastele)
+TIERS = [(0.80, 0.65), (0.72, 0.50), (0.87, 0.75), (0.76, 0.35)]
+# Przesunięcie odcienia między kolejnymi kolorami (złoty podział pełnego koła)
+GOLDEN_RATIO_CONJUGATE = 0.618033988749895
+
+# Zapas awaryjny po wyczerpaniu palety: wszystkie kolory #RRGGBB z kanałami 128-255,
+# przechodzone w stałej kolejności (nieparzysty krok daje permutację całego zakresu)
+FALLBACK_SIZE = 128 ** 3
+FALLBACK_STRIDE = 797161
+
+
+def _hex(r, g, b):
+    return f'#{r:02X}{g:02X}{b:02X}'
+
+
+def build_palette():
+    # Uporządkowana lista kolorów bez powtórzeń i bez kolorów zarezerwowanych w PASTEL_COLORS
+    reserved = set(PASTEL_COLORS.values())
+    palette = []
+    seen = set()
+    for lightness, saturation in TIERS:
+        for i in range(HUES_PER_TIER):
+            hue = (i * GOLDEN_RATIO_CONJUGATE) % 1.0
+            r, g, b = (round(channel * 255) for channel in colorsys.hls_to_rgb(hue, lightness, saturation))
+            color = _hex(r, g, b)
+            if color not in seen and color not in reserved:
+                seen.add(color)
+                palette.append(color)
+    return palette
+
+
+PALETTE = build_palette()
+
+
+def fallback_color(index):
+    # index-ty kolor zapasu awaryjnego (deterministycznie)
+    value = (index * FALLBACK_STRIDE) % FALLBACK_SIZE
+    return _hex(128 + (value >> 14), 128 + ((value >> 7) & 127), 128 + (value & 127))
+
+
+# Kolory przypisane na stałe nazwom z PASTEL_COLORS - nigdy nie wydajemy ich innym kategoriom
+RESERVED_COLORS = frozenset(PASTEL_COLORS.values())
+
+
+class ColorAllocator:
+    # Wydaje kolejne wolne kolory z palety, potem z zapasu awaryjnego
+    # Zajęte kolory trzymamy w zbiorze (sprawdzenie O(1)), a wskaźnik na palecie tylko rośnie,
+    # więc przydział jednego koloru kosztuje średnio O(1) niezależnie od liczby kategorii
+    # used to kolory zapisanych kategorii; kolorów z PASTEL_COLORS allocate() nie wydaje nigdy
+    def __init__(self, used=()):
+        self._used = set(used)
+        self._next = 0
+        self._next_fallback = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, color):
+        # Oznaczamy kolor jako zajęty; False, jeśli używa go już zapisana kategoria
+        with self._lock:
+            if color in self._used:
+                return False
+            self._used.add(color)
+            return True
+
+    def allocate(self):
+        with self._lock:
+            while self._next < len(PALETTE):
+                color = PALETTE[self._next]
+                self._next += 1
+                if color not in self._used:
+                    self._used.add(color)
+                    return color
+            while self._next_fallback < FALLBACK_SIZE:
+                color = fallback_color(self._next_fallback)
+                self._next_fallback += 1
+                if color not in self._used and color not in RESERVED_COLORS:
+                    self._used.add(color)
+                    return color
+        raise ValueError("Brak wolnych kolorów dla nowej kategorii")
+
+    def allocate_many(self, count):
+        # Kolory dla wielu nowych kategorii naraz (np. przy imporcie)
+        return [self.allocate() for _ in range(count)]
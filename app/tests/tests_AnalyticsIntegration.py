@@ -0,0 +1,99 @@
+import os
+os.environ['TEST_MODE'] = 'True'
+
+import unittest
+from datetime import date
+from peewee import PostgresqlDatabase, SqliteDatabase
+import app.analytics as analytics
+
+# Osobna baza w pamięci dla modeli używanych przez moduł analytics
+test_db = SqliteDatabase(":memory:")
+
+
+# Sprawdzamy, że agregacje liczone w SQL dają te same wyniki co wcześniejsze grupowanie w pandas
+class TestAnalyticsIntegration(unittest.TestCase):
+
+    def setUp(self):
+        self.Expense = analytics.Expense
+        self.Summary = analytics.ExpenseMonthlySummary
+        self.models = [analytics.Category, self.Expense, self.Summary]
+        # Podpinamy modele pod bazę testową tylko na czas testu (bind_ctx przywraca potem ich bazę),
+        # żeby kolejne pliki testów używały wspólnej bazy modeli
+        self.binding = test_db.bind_ctx(self.models)
+        self.binding.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(self.models)
+
+        self.categories = {name: analytics.Category.create_category(name) for name in ("Jedzenie", "Transport", "Rozrywka")}
+        for amount, category, day in [
+            (100.0, "Jedzenie", date(2024, 5, 1)),
+            (50.0, "Jedzenie", date(2024, 5, 1)),
+            (30.0, "Transport", date(2024, 5, 20)),
+            (200.0, "Jedzenie", date(2024, 6, 3)),
+            (10.0, "Rozrywka", date(2023, 12, 31)),
+        ]:
+            self.Expense.create(amount=amount, category=self.categories[category], date=day)
+
+    def tearDown(self):
+        test_db.drop_tables(self.models)
+        test_db.close()
+        self.binding.__exit__(None, None, None)
+
+    # TC1: Lista miesięcy od najnowszego
+    def test_available_months(self):
+        self.assertEqual(analytics.available_months(), ["2024-06", "2024-05", "2023-12"])
+
+    # TC2: Sumy po miesiącu i kategorii oraz sumy miesięczne
+    def test_monthly_totals(self):
+        self.assertEqual(analytics.monthly_category_totals(), [
+            ("2023-12", "Rozrywka", 10.0),
+            ("2024-05", "Jedzenie", 150.0),
+            ("2024-05", "Transport", 30.0),
+            ("2024-06", "Jedzenie", 200.0),
+        ])
+        self.assertEqual(analytics.monthly_totals(), [("2023-12", 10.0), ("2024-05", 180.0), ("2024-06", 200.0)])
+
+    # TC3: Sumy po kategorii - wszystkie i dla jednego miesiąca, od największej
+    def test_category_totals(self):
+        self.assertEqual(analytics.category_totals(), [("Jedzenie", 350.0), ("Transport", 30.0), ("Rozrywka", 10.0)])
+        self.assertEqual(analytics.category_totals("2024-05"), [("Jedzenie", 150.0), ("Transport", 30.0)])
+        self.assertEqual(analytics.category_totals("2020-01"), [])
+
+    # TC4: Średnia z miesięcznych sum w kategorii
+    def test_average_monthly(self):
+        self.assertEqual(analytics.average_monthly_by_category(),
+                         [("Jedzenie", 175.0), ("Transport", 30.0), ("Rozrywka", 10.0)])
+
+    # TC5: Podsumowanie miesięczne śledzi edycję i usuwanie wydatków, a rebuild odtwarza je z tabeli wydatków
+    def test_summary_follows_writes_and_rebuild(self):
+        expense = self.Expense.get(self.Expense.category == self.categories["Transport"])
+        self.Expense.update_expense(expense.id, date=date(2024, 6, 10), amount=40.0)
+        self.assertEqual(analytics.monthly_totals(), [("2023-12", 10.0), ("2024-05", 150.0), ("2024-06", 240.0)])
+
+        rozrywka = self.Expense.get(self.Expense.category == self.categories["Rozrywka"])
+        self.Expense.delete_expense(rozrywka.id)
+        self.assertEqual(analytics.available_months(), ["2024-06", "2024-05"])
+
+        expected = analytics.monthly_category_totals()
+        self.Summary.delete().execute()
+        self.assertEqual(self.Summary.rebuild(), 3)
+        self.assertEqual(analytics.monthly_category_totals(), expected)
+
+    # TC6: Suma narastająca liczona funkcją okna po sumach dziennych, opcjonalnie ograniczona liczbą punktów
+    def test_cumulative_totals(self):
+        self.assertEqual(analytics.cumulative_totals(), [
+            (date(2023, 12, 31), 10.0), (date(2024, 5, 1), 160.0),
+            (date(2024, 5, 20), 190.0), (date(2024, 6, 3), 390.0)])
+        # Przy limicie 2 punktów zostaje co drugi dzień, zawsze z ostatnim i z dokładną sumą
+        self.assertEqual(analytics.cumulative_totals(max_points=2), [(date(2024, 5, 1), 160.0), (date(2024, 6, 3), 390.0)])
+        self.assertEqual(len(analytics.cumulative_totals(max_points=10)), 4)
+
+    # TC7: Zapytanie z limitem punktów w składni Postgresa - bez gołego % (psycopg2 traktuje go jako parametr)
+    def test_cumulative_query_postgres(self):
+        sql, params = analytics.cumulative_query(max_points=2).bind(PostgresqlDatabase("budget")).sql()
+        self.assertIn("MOD(", sql)
+        self.assertNotIn("%", sql.replace("%s", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import os
 os.environ['TEST_MODE'] = 'True'
 
+import sys
 import tempfile
 import unittest
 import pandas as pd
@@ -10,6 +11,11 @@ from app.database import db
 from app.backup import import_from_csv, export_to_csv, CSV_FILE
 
 
+# Id kategorii o podanej nazwie (brakującą dodajemy) - wydatek przyjmuje kategorię, a nie jej nazwę
+def category_id(category_model, name):
+    return category_model.ids_for_names([name])[name]
+
+
 class TestBackupIntegration(unittest.TestCase):
     # Testują cały flow z rzeczywistymi plikami i bazą
 
@@ -55,8 +61,8 @@ class TestBackupIntegration(unittest.TestCase):
     # TC1: Eksport bazy z rekordami do CSV
     def test_export_import_roundtrip(self):
         # Dodajemy dwa poprawne rekordy
-        Expense.create(id=1, amount=100, category="Food", date="2024-01-01")
-        Expense.create(id=2, amount=200, category="Transport", date="2024-01-02")
+        Expense.create(id=1, amount=100, category=category_id(Category, "Food"), date="2024-01-01")
+        Expense.create(id=2, amount=200, category=category_id(Category, "Transport"), date="2024-01-02")
 
         original_count = len(list(Expense.select()))
         export_to_csv()
@@ -206,7 +212,7 @@ class TestBackupIntegration(unittest.TestCase):
 
     # TC8: Kolejność kolumn w CSV
     def test_csv_column_order_preserved(self):
-        Expense.create(amount=100.0, category="Test", date=date(2024, 5, 1))
+        Expense.create(amount=100.0, category=category_id(Category, "Test"), date=date(2024, 5, 1))
 
         export_to_csv()
         df = pd.read_csv(self.temp_csv.name, encoding='utf-8-sig')
@@ -258,3 +264,317 @@ class TestBackupIntegration(unittest.TestCase):
 
 
 
+
+    # TC9: Import paczkami aktualizuje istniejące wydatki i dodaje nowe
+    def test_import_csv_bulk_upsert(self):
+        # Używamy modelu z modułu backup, bo to on zapisuje dane podczas importu
+        BackupExpense = self.backup_module.Expense
+        BackupExpense.delete().execute()
+        BackupExpense.create(id=1, amount=1.0, category=category_id(self.backup_module.Category, "Stara"), date=date(2024, 1, 1))
+
+        test_data = {
+            "ID": [1, 2, 3, 2],
+            "Kwota": [100.0, 200.0, None, 250.0],
+            "Kategoria": ["Jedzenie", "Transport", "Transport", "Transport"],
+            "Data": ["2024-05-01", "2024-05-02", "2024-05-03", "2024-05-04"]
+        }
+        pd.DataFrame(test_data).to_csv(self.temp_csv.name, index=False, encoding="utf-8")
+
+        count = self.backup_module.import_from_csv(batch_size=2)
+
+        # Wiersz bez kwoty jest pomijany, powtórzone id liczy się dwa razy
+        self.assertEqual(count, 3)
+        expenses = {e.id: e for e in BackupExpense.select()}
+        self.assertEqual(set(expenses), {1, 2})
+        self.assertEqual(expenses[1].amount, 100.0)
+        self.assertEqual(expenses[1].category.name, "Jedzenie")
+        self.assertEqual(expenses[2].amount, 250.0)
+        self.assertEqual(str(expenses[2].date), "2024-05-04")
+        BackupExpense.delete().execute()
+
+    # TC10: Import strumieniowy porcjami z raportem postępu
+    def test_import_csv_chunked_with_progress(self):
+        BackupExpense = self.backup_module.Expense
+        BackupExpense.delete().execute()
+
+        test_data = {
+            "Kwota": [10.0, 20.0, -5.0, 40.0, 50.0],
+            "ID": [1, 2, 3, 4, 5],
+            "Kategoria": ["Jedzenie"] * 5,
+            "Data": ["2024-05-01", "2024-05-02", "2024-05-03", "2024-05-04", "2024-05-05"]
+        }
+        pd.DataFrame(test_data).to_csv(self.temp_csv.name, index=False, encoding="utf-8-sig")
+
+        progress = []
+        count = self.backup_module.import_from_csv(
+            chunksize=2,
+            progress_callback=lambda rows, imported, fraction: progress.append((rows, imported, fraction))
+        )
+
+        self.assertEqual(count, 4)
+        self.assertEqual(BackupExpense.select().count(), 4)
+        # Trzy porcje: 2 + 2 + 1 wierszy, postęp kończy się na całym pliku
+        self.assertEqual([p[0] for p in progress], [2, 4, 5])
+        self.assertEqual([p[1] for p in progress], [2, 3, 4])
+        self.assertEqual(progress[-1][2], 1.0)
+        self.assertEqual(self.backup_module.LAST_IMPORT_STATS["rejected"], 1)
+        BackupExpense.delete().execute()
+
+    # TC11: Niezmieniony plik nie jest importowany ponownie
+    def test_import_skipped_when_csv_unchanged(self):
+        BackupExpense = self.backup_module.Expense
+        BackupExpense.delete().execute()
+        self.backup_module.ImportManifest.delete().execute()
+
+        pd.DataFrame({
+            "ID": [1], "Kwota": [10.0], "Kategoria": ["Jedzenie"], "Data": ["2024-05-01"]
+        }).to_csv(self.temp_csv.name, index=False, encoding="utf-8")
+
+        self.assertEqual(self.backup_module.import_from_csv(skip_unchanged=True), 1)
+        manifest = self.backup_module.get_import_manifest(self.temp_csv.name)
+        self.assertIsNotNone(manifest.imported_at)
+        self.assertEqual(manifest.imported_count, 1)
+
+        # Drugi import tego samego pliku jest pomijany
+        BackupExpense.delete().execute()
+        self.assertEqual(self.backup_module.import_from_csv(skip_unchanged=True), 0)
+        self.assertTrue(self.backup_module.LAST_IMPORT_STATS["skipped"])
+        self.assertEqual(BackupExpense.select().count(), 0)
+
+        # Zmiana zawartości pliku wymusza ponowny import
+        pd.DataFrame({
+            "ID": [1, 2], "Kwota": [10.0, 20.0], "Kategoria": ["Jedzenie"] * 2, "Data": ["2024-05-01"] * 2
+        }).to_csv(self.temp_csv.name, index=False, encoding="utf-8")
+        self.assertEqual(self.backup_module.import_from_csv(skip_unchanged=True), 2)
+        BackupExpense.delete().execute()
+        self.backup_module.ImportManifest.delete().execute()
+
+    # TC12: Dziennik zmian i kompaktowanie do CSV
+    def test_journal_compaction(self):
+        from types import SimpleNamespace
+        journal_file = self.temp_csv.name + ".journal"
+        original_journal = self.backup_module.JOURNAL_FILE
+        self.backup_module.JOURNAL_FILE = journal_file
+        try:
+            pd.DataFrame({
+                "ID": [1, 2], "Kwota": [10.0, 20.0], "Kategoria": ["Jedzenie", "Transport"],
+                "Data": ["2024-05-01", "2024-05-02"]
+            }).to_csv(self.temp_csv.name, index=False, encoding="utf-8-sig")
+
+            self.backup_module.append_to_journal(
+                "update", SimpleNamespace(id=1, amount=15.0, category="Jedzenie", date=date(2024, 5, 1)))
+            self.backup_module.append_to_journal(
+                "delete", SimpleNamespace(id=2, amount=20.0, category="Transport", date=date(2024, 5, 2)))
+            self.backup_module.append_to_journal(
+                "insert", SimpleNamespace(id=3, amount=30.0, category="Transport", date=date(2024, 4, 30)))
+
+            applied = self.backup_module.compact_journal()
+
+            self.assertEqual(applied, 3)
+            self.assertFalse(os.path.exists(journal_file))
+            df = pd.read_csv(self.temp_csv.name, encoding="utf-8-sig")
+            self.assertListEqual(list(df.columns), ["ID", "Kwota", "Kategoria", "Data"])
+            # Posortowane po dacie, usunięty wiersz 2, zaktualizowany wiersz 1
+            self.assertEqual(df["ID"].tolist(), [3, 1])
+            self.assertEqual(df["Kwota"].tolist(), [30.0, 15.0])
+        finally:
+            self.backup_module.JOURNAL_FILE = original_journal
+            if os.path.exists(journal_file):
+                os.unlink(journal_file)
+
+    # TC13: Eksport podmienia plik atomowo i nie zostawia plików tymczasowych
+    def test_export_writes_atomically(self):
+        self.backup_module.Expense.delete().execute()
+        self.backup_module.Expense.create(id=1, amount=10.0, category=category_id(self.backup_module.Category, "Jedzenie"), date=date(2024, 5, 1))
+
+        export_to_csv()
+
+        directory = os.path.dirname(self.temp_csv.name)
+        base = os.path.splitext(os.path.basename(self.temp_csv.name))[0]
+        leftovers = [f for f in os.listdir(directory) if f.startswith(base) and f.endswith(".tmp.csv")]
+        self.assertEqual(leftovers, [])
+        df = pd.read_csv(self.temp_csv.name, encoding='utf-8-sig')
+        self.assertEqual(df["ID"].tolist(), [1])
+        self.backup_module.Expense.delete().execute()
+        if os.path.exists(self.temp_csv.name + ".lock"):
+            os.unlink(self.temp_csv.name + ".lock")
+
+    # TC14: Kopia Parquet – eksport, odczyt z mapowaniem w pamięć i import
+    def test_parquet_roundtrip(self):
+        import pyarrow.parquet as pq
+        BackupExpense = self.backup_module.Expense
+        BackupExpense.delete().execute()
+        BackupExpense.create(id=1, amount=10.5, category=category_id(self.backup_module.Category, "Jedzenie"), date=date(2024, 5, 2))
+        BackupExpense.create(id=2, amount=20.0, category=category_id(self.backup_module.Category, "Transport"), date=date(2024, 5, 1))
+        parquet_path = self.temp_csv.name + ".parquet"
+
+        try:
+            self.assertEqual(self.backup_module.export_to_parquet(parquet_path), 2)
+
+            # Kategoria jest zapisana jako słownik
+            schema = pq.read_schema(parquet_path)
+            self.assertEqual(str(schema.field("Kategoria").type), "dictionary<values=string, indices=int32, ordered=0>")
+
+            df = self.backup_module.read_parquet(parquet_path)
+            self.assertListEqual(list(df.columns), ["ID", "Kwota", "Kategoria", "Data"])
+            self.assertEqual(df["ID"].tolist(), [2, 1])
+
+            BackupExpense.delete().execute()
+            self.assertEqual(self.backup_module.import_from_parquet(parquet_path), 2)
+            restored = {e.id: e for e in BackupExpense.select()}
+            self.assertEqual(restored[1].amount, 10.5)
+            self.assertEqual(restored[1].category.name, "Jedzenie")
+            self.assertEqual(str(restored[2].date), "2024-05-01")
+        finally:
+            BackupExpense.delete().execute()
+            for path in (parquet_path, parquet_path + ".lock"):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    # TC15: Konwersja CSV -> Parquet -> CSV zachowuje dane i kolumny
+    def test_csv_parquet_conversion(self):
+        parquet_path = self.temp_csv.name + ".parquet"
+        pd.DataFrame({
+            "ID": [1, 2], "Kwota": [10.0, 20.0], "Kategoria": ["Jedzenie", "Transport"],
+            "Data": ["2024-05-01", "2024-05-02"]
+        }).to_csv(self.temp_csv.name, index=False, encoding="utf-8-sig")
+
+        try:
+            self.assertEqual(self.backup_module.csv_to_parquet(self.temp_csv.name, parquet_path), 2)
+            self.assertEqual(self.backup_module.parquet_to_csv(parquet_path, self.temp_csv.name), 2)
+            df = pd.read_csv(self.temp_csv.name, encoding="utf-8-sig")
+            self.assertListEqual(list(df.columns), ["ID", "Kwota", "Kategoria", "Data"])
+            self.assertEqual(df["Kategoria"].tolist(), ["Jedzenie", "Transport"])
+            self.assertEqual(df["Data"].tolist(), ["2024-05-01", "2024-05-02"])
+        finally:
+            for path in (parquet_path, self.temp_csv.name + ".lock"):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    # TC16: Nazwy kategorii z pliku zamieniane na id jednym zapytaniem, brakujące dodawane
+    def test_ensure_categories_adds_only_missing(self):
+        BackupCategory = self.backup_module.Category
+        self.backup_module.Expense.delete().execute()
+        BackupCategory.delete().execute()
+        jedzenie = BackupCategory.create_category("Jedzenie")
+
+        ids = self.backup_module.ensure_categories(["Jedzenie", "Transport", "Transport"])
+
+        transport = BackupCategory.get(BackupCategory.name == "Transport")
+        self.assertEqual(ids, {"Jedzenie": jedzenie.id, "Transport": transport.id})
+        # Drugie wywołanie niczego nie dodaje
+        self.assertEqual(self.backup_module.ensure_categories(["Transport"]), {"Transport": transport.id})
+        self.assertEqual(BackupCategory.select().count(), 2)
+        BackupCategory.delete().execute()
+
+    # TC17: Import wielu plików – równoległe parsowanie, jeden zapisujący, błędny plik nie przerywa importu
+    def test_import_from_directory(self):
+        BackupExpense = self.backup_module.Expense
+        BackupExpense.delete().execute()
+
+        with tempfile.TemporaryDirectory() as directory:
+            pd.DataFrame({
+                "ID": [1, 2], "Kwota": [10.0, 20.0], "Kategoria": ["Jedzenie"] * 2, "Data": ["2024-05-01"] * 2
+            }).to_csv(os.path.join(directory, "konto_a.csv"), index=False, encoding="utf-8")
+            pd.DataFrame({
+                "id": [3, 4], "amount": [30.0, -1.0], "category": ["Transport"] * 2, "date": ["2024-06-01"] * 2
+            }).to_csv(os.path.join(directory, "konto_b.csv"), index=False, encoding="utf-8")
+            pd.DataFrame({"x": [1]}).to_csv(os.path.join(directory, "zly.csv"), index=False)
+
+            results = self.backup_module.import_from_directory(directory, workers=2)
+
+        stats = {os.path.basename(r["file"]): r for r in results}
+        self.assertEqual(list(stats), ["konto_a.csv", "konto_b.csv", "zly.csv"])
+        self.assertEqual(stats["konto_a.csv"]["imported"], 2)
+        self.assertEqual(stats["konto_b.csv"]["imported"], 1)
+        self.assertEqual(stats["konto_b.csv"]["rejected"], 1)
+        self.assertIn("Niespodziewane kolumny", stats["zly.csv"]["error"])
+        self.assertEqual(sorted(e.id for e in BackupExpense.select()), [1, 2, 3])
+        BackupExpense.delete().execute()
+
+    # TC18: Import przelicza podsumowanie miesięczne, a usunięcie kategorii usuwa jej wiersze
+    def test_import_rebuilds_monthly_summary(self):
+        BackupExpense = self.backup_module.Expense
+        Summary = self.backup_module.ExpenseMonthlySummary
+        BackupExpense.delete().execute()
+        Summary.delete().execute()
+
+        pd.DataFrame({
+            "ID": [1, 2, 3], "Kwota": [10.0, 15.0, 7.5],
+            "Kategoria": ["Jedzenie", "Jedzenie", "Transport"],
+            "Data": ["2024-05-01", "2024-05-20", "2024-06-02"]
+        }).to_csv(self.temp_csv.name, index=False, encoding="utf-8")
+        self.backup_module.import_from_csv(self.temp_csv.name)
+
+        rows = sorted(Summary
+                      .select(Summary.year_month, self.backup_module.Category.name, Summary.total, Summary.count)
+                      .join(self.backup_module.Category)
+                      .tuples())
+        self.assertEqual(rows, [("2024-05", "Jedzenie", 25.0, 2), ("2024-06", "Transport", 7.5, 1)])
+
+        self.backup_module.Category.delete_with_expenses("Jedzenie")
+        self.assertEqual([s.category.name for s in Summary.select()], ["Transport"])
+
+        BackupExpense.delete().execute()
+        Summary.delete().execute()
+        self.backup_module.Category.delete().execute()
+
+    # TC19: Błąd w dalszej porcji importu - zatwierdzone porcje i tak trafiają do podsumowania miesięcznego
+    def test_failed_chunk_still_rebuilds_summary(self):
+        BackupExpense = self.backup_module.Expense
+        Summary = self.backup_module.ExpenseMonthlySummary
+        BackupExpense.delete().execute()
+        Summary.delete().execute()
+        models = sys.modules[BackupExpense.__module__]
+        version = models.data_version()
+
+        def frames():
+            yield pd.DataFrame({"ID": [1, 2], "Kwota": [10.0, 15.0], "Kategoria": ["Jedzenie"] * 2,
+                                "Data": ["2024-05-01", "2024-05-20"]})
+            raise IOError("przerwany odczyt pliku")
+
+        with self.assertRaises(IOError):
+            self.backup_module._import_frames(frames(), reject_report="")
+
+        self.assertEqual(BackupExpense.select().count(), 2)
+        self.assertEqual([(s.year_month, s.total, s.count) for s in Summary.select()], [("2024-05", 25.0, 2)])
+        self.assertGreater(models.data_version(), version)
+
+        BackupExpense.delete().execute()
+        Summary.delete().execute()
+        self.backup_module.Category.delete().execute()
+
+    # TC20: Import Parquet porcjami - numery odrzuconych wierszy liczone od początku pliku
+    def test_parquet_reject_rows_across_batches(self):
+        parquet_path = self.temp_csv.name + ".parquet"
+        report_path = self.temp_csv.name + ".rejects.csv"
+        self.backup_module.write_parquet(pd.DataFrame({
+            "ID": [1, 2, 3, 4, 5], "Kwota": [10.0, -1.0, 20.0, 30.0, -2.0],
+            "Kategoria": ["Jedzenie"] * 5, "Data": ["2024-05-01"] * 5
+        }), parquet_path)
+
+        try:
+            self.assertEqual(self.backup_module.import_from_parquet(parquet_path, chunksize=2, reject_report=report_path), 3)
+            rejects = pd.read_csv(report_path, encoding="utf-8-sig")
+            self.assertEqual(rejects["Wiersz"].tolist(), [3, 6])
+        finally:
+            self.backup_module.Expense.delete().execute()
+            self.backup_module.ExpenseMonthlySummary.delete().execute()
+            for path in (parquet_path, parquet_path + ".lock", report_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    # TC21: Konwersja CSV -> Parquet wykrywa kodowanie pliku (latin-1)
+    def test_csv_to_parquet_detects_encoding(self):
+        parquet_path = self.temp_csv.name + ".parquet"
+        pd.DataFrame({
+            "ID": [1], "Kwota": [10.0], "Kategoria": ["Café"], "Data": ["2024-05-01"]
+        }).to_csv(self.temp_csv.name, index=False, encoding="latin-1")
+
+        try:
+            self.assertEqual(self.backup_module.csv_to_parquet(self.temp_csv.name, parquet_path), 1)
+            self.assertEqual(self.backup_module.read_parquet(parquet_path)["Kategoria"].tolist(), ["Café"])
+        finally:
+            for path in (parquet_path, parquet_path + ".lock"):
+                if os.path.exists(path):
+                    os.unlink(path)
@@ -122,18 +122,18 @@ class TestBackupUnit(unittest.TestCase):
 
         # Patchujemy wszystko
         with patch("app.backup.pd.read_csv", return_value=df_mock), \
-                patch("app.backup.Expense.create") as mock_create, \
-                patch("app.backup.Expense.get_or_none", return_value=None), \
+                patch("app.backup.upsert_expenses", return_value=1) as mock_upsert, \
                 patch("app.backup.db.atomic"):  # mockujemy kontekst
 
             import_from_csv()
 
-            # Drugi rekord powinien zostać dodany
-            mock_create.assert_called_once()
-            args, kwargs = mock_create.call_args
-            assert kwargs["amount"] == 200.0
-            assert kwargs["category"] == "Transport"
-            assert str(kwargs["date"]) == "2024-05-02"
+            # Drugi rekord powinien zostać przekazany do zapisu
+            mock_upsert.assert_called_once()
+            rows = mock_upsert.call_args[0][0]
+            assert len(rows) == 1
+            assert rows[0]["amount"] == 200.0
+            assert rows[0]["category"] == "Transport"
+            assert str(rows[0]["date"]) == "2024-05-02"
 
     # TC7: Import CSV z brakującymi kolumnami
     @patch('app.backup.pd.read_csv')
@@ -170,4 +170,124 @@ class TestBackupUnit(unittest.TestCase):
         expected_columns = ["ID", "Kwota", "Kategoria", "Data"]
         self.assertListEqual(list(df.columns), expected_columns)
 
+    # TC9: Zapis paczkami – duplikaty id w pliku liczone jak przy zapisie wiersz po wierszu
+    def test_upsert_expenses_batches(self):
+        from app.backup import upsert_expenses
+        rows = [
+            {"id": 1, "amount": 10.0, "category": "Test", "date": "2024-01-01"},
+            {"id": 2, "amount": 20.0, "category": "Test", "date": "2024-01-02"},
+            {"id": 1, "amount": 15.0, "category": "Test", "date": "2024-01-01"},
+        ]
+        with patch("app.backup.Expense.insert_many") as mock_insert_many, \
+                patch("app.backup.db.atomic"):
+            written = upsert_expenses(rows, batch_size=2)
+
+        self.assertEqual(written, 3)
+        # Dwie paczki: [1, 2] oraz [1]
+        self.assertEqual(mock_insert_many.call_count, 2)
+        first_batch = mock_insert_many.call_args_list[0][0][0]
+        self.assertEqual([r["id"] for r in first_batch], [1, 2])
+
+
+
+    # TC10: Walidacja całej ramki – powody odrzucenia i numery wierszy
+    def test_validate_expenses_masks(self):
+        from app.backup import validate_expenses
+        df = pd.DataFrame({
+            "id": [1, 2, 3, 4, 5, "x"],
+            "amount": [10.0, None, 5.0, "abc", -3.0, 7.0],
+            "category": ["A", "B", "C", "D", "E", "F"],
+            "date": ["2024-01-01", "2024-01-02", "2024-13-01", "2024-01-04", "2024-01-05", "2024-01-06"]
+        })
+        valid, rejects = validate_expenses(df)
+
+        self.assertEqual(valid["id"].tolist(), [1])
+        self.assertEqual(str(valid.iloc[0]["date"]), "2024-01-01")
+        self.assertEqual(rejects["Wiersz"].tolist(), [3, 4, 5, 6, 7])
+        self.assertEqual(rejects["Powód"].tolist(), [
+            "brak danych", "niepoprawna data", "niepoprawna kwota", "kwota niedodatnia", "niepoprawne id"
+        ])
 
+    # TC11: Raport odrzuconych wierszy zapisywany jednym plikiem
+    @patch('app.backup.write_reject_report')
+    @patch('app.backup.pd.read_csv')
+    def test_import_writes_reject_report(self, mock_read_csv, mock_report):
+        mock_read_csv.return_value = pd.DataFrame({
+            "id": [1, 2], "kwota": [0, 20.0], "kategoria": ["A", "B"], "data": ["2024-01-01", "2024-01-02"]
+        })
+        with patch("app.backup.upsert_expenses", return_value=1), patch("app.backup.db.atomic"):
+            count = import_from_csv(reject_report="odrzucone.csv")
+
+        self.assertEqual(count, 1)
+        mock_report.assert_called_once()
+        rejects, path = mock_report.call_args[0]
+        self.assertEqual(path, "odrzucone.csv")
+        self.assertEqual(rejects["Powód"].tolist(), ["kwota niedodatnia"])
+
+    # TC12: Ładowanie przez COPY do tabeli tymczasowej i scalenie z expense (Postgres, mock kursora)
+    @patch('app.backup.db')
+    def test_copy_expenses_stages_and_merges(self, mock_db):
+        from app.backup import copy_expenses
+        cursor = mock_db.cursor.return_value
+        valid = pd.DataFrame({
+            "id": [1, 1], "amount": [10.0, 15.0], "category": ["A", "A"], "date": ["2024-01-01", "2024-01-02"]
+        })
+
+        written = copy_expenses(valid)
+
+        self.assertEqual(written, 2)
+        copy_sql, buffer = cursor.copy_expert.call_args[0]
+        self.assertIn("COPY expense_staging", copy_sql)
+        self.assertIn("FROM STDIN", copy_sql)
+        # Kolejność wierszy z pliku trafia do kolumny row_no
+        self.assertEqual(buffer.getvalue().splitlines(), ["0,1,10.0,A,2024-01-01", "1,1,15.0,A,2024-01-02"])
+        executed = " ".join(call[0][0] for call in cursor.execute.call_args_list)
+        self.assertIn("DISTINCT ON (id)", executed)
+        self.assertIn("ON CONFLICT (id) DO UPDATE", executed)
+        # Kwoty zaokrąglane na numeric, jak to_grosze
+        self.assertIn("ROUND(CAST(s.amount AS NUMERIC) * 100)", executed)
+
+    # TC13: W TEST_MODE (SQLite) import nie używa COPY
+    def test_copy_not_used_in_test_mode(self):
+        from app.backup import use_copy
+        self.assertFalse(use_copy())
+
+    # TC14: Wykrywanie kodowania z BOM i próbki bajtów
+    def test_detect_encoding(self):
+        import tempfile
+        from app.backup import detect_encoding
+        samples = {
+            "utf-8-sig": "\ufeffID,Kwota\n1,Żółć\n".encode("utf-8"),
+            "utf-8": "ID,Kategoria\n1,Żółć\n".encode("utf-8"),
+            "latin-1": "ID,Kategoria\n1,Café\n".encode("latin-1"),
+        }
+        for expected, content in samples.items():
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+                f.write(content)
+            try:
+                self.assertEqual(detect_encoding(f.name), expected)
+                # Znak wielobajtowy ucięty na końcu próbki nie zmienia wyniku
+                if expected == "utf-8":
+                    self.assertEqual(detect_encoding(f.name, sample_size=content.index("ó".encode()) + 1), "utf-8")
+            finally:
+                os.unlink(f.name)
+
+    # TC15: Plik latin-1 jest parsowany tylko raz
+    def test_import_parses_latin1_once(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+            f.write("ID,Kwota,Kategoria,Data\n1,10.0,Café,2024-05-01\n".encode("latin-1"))
+        try:
+            with patch("app.backup.pd.read_csv", wraps=pd.read_csv) as mock_read_csv, \
+                    patch("app.backup.upsert_expenses", return_value=1) as mock_upsert, \
+                    patch("app.backup.db.atomic"):
+                count = import_from_csv(csv_file=f.name)
+
+            self.assertEqual(count, 1)
+            mock_read_csv.assert_called_once()
+            self.assertEqual(mock_read_csv.call_args[1]["encoding"], "latin-1")
+            self.assertEqual(mock_upsert.call_args[0][0][0]["category"], "Café")
+            from app.backup import LAST_IMPORT_STATS
+            self.assertEqual(LAST_IMPORT_STATS["encoding"], "latin-1")
+        finally:
+            os.unlink(f.name)
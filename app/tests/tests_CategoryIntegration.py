@@ -2,9 +2,11 @@ import os
 os.environ['TEST_MODE'] = 'True'
 
 import unittest
-from app.models import Category, Expense
+from unittest.mock import patch
+from app.models import Category, CategoryRegistry, Expense
 from app.database import db
 from app.colors import PASTEL_COLORS
+from app.palette import PALETTE
 
 class TestCategory(unittest.TestCase):
     # Każdy test startuje na świeżej, in-memory bazie SQLite.
@@ -143,3 +145,61 @@ class TestCategory(unittest.TestCase):
             self.assertTrue(c.is_active)
             # MA SENS, sprawdza generowanie koloru, zapis w bazie, sprawdzenie unikalności względem wszystkich kategorii i PASTEL_COLORS
 
+
+    # TC9: Tworzenie wielu kategorii naraz z unikalnymi kolorami
+    def test_create_categories_bulk(self):
+        Category.create_category("X", color=None)
+        created = Category.create_categories(["Biżuteria", "Y", "Z"])
+        self.assertEqual(created, 3)
+
+        cats = {c.name: c for c in Category.get_all_categories()}
+        self.assertEqual(set(cats), {"X", "Biżuteria", "Y", "Z"})
+        # Nazwy z PASTEL_COLORS dostają swój kolor, pozostałe unikalne kolory
+        self.assertEqual(cats["Biżuteria"].color, PASTEL_COLORS["Biżuteria"])
+        colors = [c.color for c in cats.values()]
+        self.assertEqual(len(colors), len(set(colors)))
+        self.assertTrue(all(c.is_active for c in cats.values()))
+
+    # TC10: Rejestr kategorii - jedno zapytanie, potem odczyty ze słownika; zapisy kategorii go unieważniają
+    def test_category_registry(self):
+        CategoryRegistry.invalidate()
+        Category.create_category("Biżuteria", color=None)
+        Category.create_categories(["X", "Y"])
+        self.assertEqual(CategoryRegistry.names(), ["Biżuteria", "X", "Y"])
+        with patch.object(Category, "select", side_effect=AssertionError("zapytanie do bazy")):
+            self.assertEqual(CategoryRegistry.get("Biżuteria").color, PASTEL_COLORS["Biżuteria"])
+            self.assertEqual(set(CategoryRegistry.color_map(["X", "Nie ma"])), {"X"})
+
+        Category.deactivate_category("X")
+        self.assertEqual(CategoryRegistry.names(active_only=True), ["Biżuteria", "Y"])
+        Category.activate_category("X")
+        self.assertTrue(CategoryRegistry.get("X").is_active)
+        Category.delete_with_expenses("Y")
+        self.assertIsNone(CategoryRegistry.get("Y"))
+        Category.create_category("Z", color=None)
+        self.assertEqual(CategoryRegistry.get("Z").id, Category.get(Category.name == "Z").id)
+
+    # TC11: Kolor z palety zajęty w międzyczasie przez inny proces - ponowna próba z kolorami wczytanymi z bazy
+    def test_color_conflict_retry(self):
+        Category.color_allocator(reseed=True)
+        Category.insert(name="Obca", color=PALETTE[0]).execute()
+        self.assertEqual(Category.create_category("Nowa").color, PALETTE[1])
+
+        Category.color_allocator(reseed=True)
+        Category.insert(name="Obca 2", color=PALETTE[2]).execute()
+        self.assertEqual(Category.create_categories(["A", "B"]), 2)
+        self.assertEqual(Category.get(Category.name == "A").color, PALETTE[3])
+
+    # TC12: Rejestr unieważniany po zatwierdzeniu zapisu kategorii, a nie w trakcie transakcji
+    def test_registry_invalidated_after_commit(self):
+        database = Category._meta.database
+        in_transaction = []
+        with patch.object(CategoryRegistry, "invalidate", side_effect=lambda: in_transaction.append(database.in_transaction())):
+            for write in [lambda: Category.create_category("X"),
+                          lambda: Category.create_categories(["Y", "Z"]),
+                          lambda: Category.deactivate_category("X"),
+                          lambda: Category.get(Category.name == "Y").delete_instance()]:
+                in_transaction.clear()
+                write()
+                self.assertTrue(in_transaction)
+                self.assertFalse(in_transaction[-1])
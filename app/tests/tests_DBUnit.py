@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 import app.database as database
@@ -6,27 +8,24 @@ from app import models
 
 class TestDatabaseUnit(unittest.TestCase):
 
+    @patch('app.migrations.migrate')
     @patch('app.database.db')
-    def test_init_db_calls_connect_and_create_tables(self, mock_db):
-        # db.is_closed zwraca True, więc init_db powinno wywołać connect i create_tables
+    def test_init_db_calls_connect(self, mock_db, mock_migrate):
+        # db.is_closed zwraca True, więc init_db powinno wywołać connect
+        # Migracje wykonuje import models, nie każdy przebieg init_db
         mock_db.is_closed.return_value = True
-        # Mockujemy BaseModel.__subclasses__
-        mock_base_model = MagicMock()
-        with patch('app.models.BaseModel.__subclasses__', return_value=[mock_base_model]):
-            database.init_db()
+        database.init_db()
 
         mock_db.connect.assert_called_once()
-        mock_db.create_tables.assert_called_once_with([mock_base_model], safe=True)
+        mock_migrate.assert_not_called()
 
     @patch('app.database.db')
     def test_init_db_when_already_connected(self, mock_db):
         # db.is_closed zwraca False → connect nie powinno być wywołane
         mock_db.is_closed.return_value = False
-        with patch('app.models.BaseModel.__subclasses__', return_value=[]):
-            database.init_db()
+        database.init_db()
 
         mock_db.connect.assert_not_called()
-        mock_db.create_tables.assert_called_once_with([], safe=True)
 
     @patch('app.database.db')
     def test_close_db_calls_close(self, mock_db):
@@ -39,3 +38,48 @@ class TestDatabaseUnit(unittest.TestCase):
         mock_db.is_closed.return_value = True
         database.close_db()
         mock_db.close.assert_not_called()
+
+
+class TestConnectionPoolUnit(unittest.TestCase):
+
+    def make_connection(self):
+        # Atrapa połączenia psycopg2 w stanie "bez transakcji"
+        conn = MagicMock()
+        conn.closed = False
+        conn.server_version = 150000
+        conn.get_transaction_status.return_value = 0
+        return conn
+
+    @patch('peewee.PostgresqlDatabase._connect')
+    def test_pool_reuses_connections_and_counts_waits(self, mock_connect):
+        mock_connect.side_effect = lambda: self.make_connection()
+        pool = database.MonitoredPooledPostgresqlDatabase('test', max_connections=1, stale_timeout=300, timeout=5)
+
+        # Pierwszy wątek trzyma jedyne połączenie, drugi czeka, aż zostanie oddane do puli
+        pool.connect()
+        waited = {}
+
+        def second_session():
+            pool.connect()
+            waited['stats'] = pool.pool_stats()
+            pool.close()
+
+        thread = threading.Thread(target=second_session)
+        thread.start()
+        time.sleep(0.3)
+        pool.close()
+        thread.join(5)
+
+        stats = pool.pool_stats()
+        # Jedno fizyczne połączenie, wydane dwa razy; drugie pobranie czekało
+        self.assertEqual(mock_connect.call_count, 1)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["wait_time"], 0.1)
+        self.assertEqual(waited['stats']["in_use"], 1)
+        self.assertEqual((stats["in_use"], stats["idle"], stats["max_connections"]), (0, 1, 1))
+
+    def test_pool_stats_without_pool(self):
+        # W trybie testowym (SQLite) nie ma puli, więc nie ma też statystyk
+        with patch('app.database.db', MagicMock()):
+            self.assertIsNone(database.pool_stats())
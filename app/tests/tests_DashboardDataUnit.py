@@ -0,0 +1,41 @@
+import os
+os.environ['TEST_MODE'] = 'True'
+
+import unittest
+from unittest.mock import patch
+import app.dashboard_data as dashboard_data
+import app.models as models
+
+
+class TestDashboardData(unittest.TestCase):
+
+    # TC1: Funkcje publiczne przekazują bieżącą wersję danych jako klucz pamięci podręcznej
+    @patch("app.dashboard_data._category_frame")
+    @patch("app.dashboard_data._monthly_frame")
+    def test_version_is_cache_key(self, mock_monthly, mock_category):
+        with patch("app.dashboard_data.data_version", return_value=7):
+            dashboard_data.monthly_frame()
+            dashboard_data.category_frame("2024-05")
+        mock_monthly.assert_called_once_with(7)
+        mock_category.assert_called_once_with(7, "2024-05")
+
+    # TC2: Ramka miesięczna zawiera polskie nazwy miesięcy
+    @patch("app.dashboard_data.analytics.monthly_totals", return_value=[("2024-05", 10.0), ("2024-06", 5.0)])
+    def test_monthly_frame_enriched(self, mock_totals):
+        df = dashboard_data._monthly_frame(-1)
+        self.assertEqual(df["month_polish"].tolist(), ["Maj 2024", "Czerwiec 2024"])
+
+    # TC3: Zapis kategorii zwiększa licznik wersji danych
+    def test_category_write_bumps_version(self):
+        before = models.data_version()
+        with patch("peewee.Model.save", return_value=1):
+            models.Category(name="Test", color="#FFFFFF").save()
+        self.assertEqual(models.data_version(), before + 1)
+
+    # TC4: Polska nazwa miesiąca
+    def test_polish_month_label(self):
+        self.assertEqual(dashboard_data.polish_month_label("2024-05"), "Maj 2024")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.downsampling import lttb, lttb_indices, fold_categories, line_chart, bar_chart, pie_chart, OTHER_LABEL
+
+
+class TestDownsampling(unittest.TestCase):
+
+    # TC1: LTTB zostawia budżet punktów, pierwszy i ostatni punkt oraz wyraźny szczyt
+    def test_lttb_keeps_shape(self):
+        y = np.zeros(1000)
+        y[437] = 100.0
+        df = pd.DataFrame({"date": pd.date_range("2020-01-01", periods=1000), "amount": y})
+        sampled = lttb(df, "date", "amount", 50)
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual(sampled.index[0], 0)
+        self.assertEqual(sampled.index[-1], 999)
+        self.assertIn(437, sampled.index)
+        self.assertTrue(sampled.index.is_monotonic_increasing)
+        # Krótka seria zostaje bez zmian
+        self.assertEqual(list(lttb_indices(["a", "b", "c"], [1, 2, 3], 10)), [0, 1, 2])
+
+    # TC2: Kategorie poza top N sklejane w "Inne" osobno dla każdego miesiąca, suma bez zmian
+    def test_fold_categories(self):
+        df = pd.DataFrame({
+            "month": ["2024-05"] * 4 + ["2024-06"] * 2,
+            "category": ["A", "B", "C", "D", "A", "D"],
+            "amount": [100.0, 50.0, 5.0, 1.0, 70.0, 2.0],
+        })
+        folded = fold_categories(df, "category", "amount", max_categories=3)
+        self.assertEqual(set(folded["category"]), {"A", "B", OTHER_LABEL})
+        may_other = folded[(folded["month"] == "2024-05") & (folded["category"] == OTHER_LABEL)]["amount"]
+        self.assertEqual(may_other.tolist(), [6.0])
+        self.assertEqual(folded["amount"].sum(), df["amount"].sum())
+        # Mało kategorii - ramka bez zmian
+        self.assertIs(fold_categories(df, "category", "amount", max_categories=10), df)
+
+    # TC3: Wykresy dostają ograniczoną liczbę punktów, duże serie liniowe rysowane przez WebGL
+    def test_charts_bounded(self):
+        line_df = pd.DataFrame({"date": pd.date_range("2000-01-01", periods=5000), "amount": np.arange(5000.0)})
+        fig = line_chart(line_df, x="date", y="amount", max_points=800)
+        self.assertEqual(len(fig.data[0].x), 800)
+        self.assertEqual(fig.data[0].type, "scattergl")
+
+        pie_df = pd.DataFrame({"category": [f"K{i}" for i in range(30)], "amount": np.arange(1.0, 31.0)})
+        pie = pie_chart(pie_df, names="category", values="amount", max_categories=5,
+                        color="category", color_discrete_map={"K29": "#FFB3BA"})
+        self.assertEqual(len(pie.data[0].labels), 5)
+        self.assertIn(OTHER_LABEL, list(pie.data[0].labels))
+
+        bar = bar_chart(pie_df, x="category", y="amount", max_categories=5)
+        self.assertEqual(len(bar.data[0].x), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
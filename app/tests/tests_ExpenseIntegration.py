@@ -3,8 +3,8 @@ os.environ['TEST_MODE'] = 'True'   # <- ustawienie przed importem modeli
 
 import unittest
 from datetime import date
-from peewee import SqliteDatabase
-from app.models import Category, Expense
+from peewee import PostgresqlDatabase, SqliteDatabase
+from app.models import Category, Expense, ExpenseMonthlySummary
 
 # Tworzymy osobną bazę dla testów w pamięci
 test_db = SqliteDatabase(":memory:")
@@ -20,20 +20,22 @@ class TestExpense(unittest.TestCase):
 
 
     def setUp(self):
-        test_db.bind([Category, Expense])
+        test_db.bind([Category, Expense, ExpenseMonthlySummary])
         test_db.connect(reuse_if_open=True)
-        test_db.create_tables([Category, Expense])
+        test_db.create_tables([Category, Expense, ExpenseMonthlySummary])
 
+        # Wydatek przyjmuje obiekt kategorii - kategorie tworzymy najpierw
+        self.zakupy = Category.create_category("Zakupy")
         self.test_expense = Expense.create(
             amount=100.0,
-            category="Zakupy",
+            category=self.zakupy,
             date=date(2024, 5, 1)
         )
 
 
     def tearDown(self):
         # Usuwamy tabele po każdym teście
-        test_db.drop_tables([Category, Expense])
+        test_db.drop_tables([Category, Expense, ExpenseMonthlySummary])
         test_db.close()
 
     # def setUp(self):
@@ -88,7 +90,7 @@ class TestExpense(unittest.TestCase):
         # Kwota powinna być zgodna z setUp()
         self.assertEqual(expense.amount, 100.0)
         # Kategoria powinna być zgodna z setUp()
-        self.assertEqual(expense.category, "Zakupy")
+        self.assertEqual(expense.category.name, "Zakupy")
         # MA SENS, bo pobiera konkretny wydatek po ID i weryfikuje jego wartości
 
     # TC4: Pobieranie nieistniejącego wydatku
@@ -133,14 +135,14 @@ class TestExpense(unittest.TestCase):
         # Drugi wydatek w kategorii "Zakupy"
         Expense.create(
             amount=72.0,
-            category="Zakupy",
+            category=self.zakupy,
             date=date(2024, 5, 2)
         )
 
         # Trzeci wydatek dodajemy w innej kategorii
         Expense.create(
             amount=300.0,
-            category="Biżuteria",
+            category=Category.create_category("Biżuteria"),
             date=date(2024, 5, 3)
         )
 
@@ -184,3 +186,143 @@ class TestExpense(unittest.TestCase):
         result = Expense.delete_expense(999999999)
         self.assertIsNone(result)
         # MA SENS, sprawdza zachowanie metod dla nieistniejących rekordów
+
+    # TC12: Stronicowanie po kluczu (date, id) - kolejne strony bez powtórzeń i luk
+    def test_page_keyset(self):
+        jedzenie = Category.create_category("Jedzenie")
+        for day in (2, 3, 3, 4):
+            Expense.create(amount=10.0, category=jedzenie, date=date(2024, 5, day))
+        seen = []
+        after = None
+        while True:
+            expenses, has_next = Expense.page(after=after, limit=2)
+            seen.extend((e.date, e.id) for e in expenses)
+            if not has_next:
+                break
+            after = (expenses[-1].date, expenses[-1].id)
+        # Pięć wydatków (z setUp też), od najnowszych, przy tej samej dacie malejąco po id
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(seen[-1], (date(2024, 5, 1), self.test_expense.id))
+
+    # TC13: Filtry daty, kategorii i kwoty są stosowane w zapytaniu
+    def test_page_filters(self):
+        jedzenie = Category.create_category("Jedzenie")
+        Expense.create(amount=5.0, category=jedzenie, date=date(2024, 5, 2))
+        Expense.create(amount=50.0, category=jedzenie, date=date(2024, 6, 2))
+        Expense.create(amount=60.0, category=Category.create_category("Transport"), date=date(2024, 6, 3))
+
+        expenses, has_next = Expense.page(category="Jedzenie", min_amount=10, date_from=date(2024, 6, 1))
+        self.assertEqual([(e.amount, e.category.name) for e in expenses], [(50.0, "Jedzenie")])
+        self.assertFalse(has_next)
+
+        expenses, _ = Expense.page(max_amount=50, date_to=date(2024, 5, 31))
+        self.assertEqual(sorted(e.amount for e in expenses), [5.0])
+        expenses, _ = Expense.page(category="Nie ma takiej")
+        self.assertEqual(expenses, [])
+
+    # TC14: Zbiorcza zmiana - jedno zapytanie SELECT i jedno UPDATE ... RETURNING na porcję, podsumowanie zgodne
+    def test_update_many(self):
+        Category.create_category("Transport")
+        second = Expense.create(amount=20.0, category=self.zakupy, date=date(2024, 5, 2))
+        third = Expense.create(amount=30.0, category=Category.create_category("Jedzenie"), date=date(2024, 6, 2))
+        ids = [self.test_expense.id, second.id, third.id]
+
+        executed = []
+        original_execute = test_db.execute_sql
+        def counting_execute(sql, *args, **kwargs):
+            executed.append(sql)
+            return original_execute(sql, *args, **kwargs)
+        test_db.execute_sql = counting_execute
+        try:
+            updated = Expense.update_many(ids + [999999], category="Transport")
+        finally:
+            del test_db.execute_sql
+        expense_queries = [sql for sql in executed if '"expense"' in sql and 'expense_monthly_summary' not in sql]
+        self.assertEqual(len(expense_queries), 2)
+        self.assertTrue(any("RETURNING" in sql for sql in expense_queries))
+
+        self.assertEqual(sorted(e.id for e in updated), sorted(ids))
+        self.assertEqual({e.category.name for e in Expense.select()}, {"Transport"})
+        summary = {(s.year_month, s.category.name): (s.total, s.count) for s in ExpenseMonthlySummary.select()}
+        self.assertEqual(summary, {("2024-05", "Transport"): (120.0, 2), ("2024-06", "Transport"): (30.0, 1)})
+        self.assertEqual(Expense.update_many([], amount=1.0), [])
+        # Nieistniejąca kategoria - błąd jak w create_expense, bez tworzenia kategorii
+        with self.assertRaises(ValueError):
+            Expense.update_many(ids, category="Nie ma takiej")
+        self.assertEqual(Expense.update_many([], category="Nie ma takiej"), [])
+        self.assertIsNone(Category.get_or_none(Category.name == "Nie ma takiej"))
+
+    # TC15: Zbiorcze usuwanie zwraca usunięte wiersze i usuwa puste wiersze podsumowania
+    def test_delete_many(self):
+        second = Expense.create(amount=20.0, category=Category.create_category("Jedzenie"), date=date(2024, 6, 2))
+        deleted = Expense.delete_many([self.test_expense.id, 999999])
+        self.assertEqual([(e.id, e.amount, e.category_id) for e in deleted],
+                         [(self.test_expense.id, 100.0, self.test_expense.category_id)])
+        self.assertEqual([e.id for e in Expense.select()], [second.id])
+        self.assertEqual([(s.year_month, s.total) for s in ExpenseMonthlySummary.select()], [("2024-06", 20.0)])
+
+    # TC16: Tworzenie wielu wydatków - jedno zapytanie o kategorie, jeden INSERT na porcję, błędy dla każdego wiersza
+    def test_create_many(self):
+        Category.create_category("Jedzenie")
+        rows = [{"amount": 10.0, "category": "Jedzenie", "date": date(2024, 5, 3)} for _ in range(1500)]
+        rows += [
+            {"amount": 5.0, "category": "Nie ma takiej", "date": date(2024, 5, 3)},
+            {"amount": 0, "category": "Jedzenie", "date": date(2024, 5, 3)},
+            {"amount": "abc", "category": "Jedzenie"},
+            {"amount": 2.5, "category": "Zakupy", "date": "2024-06-01"},
+        ]
+
+        executed = []
+        original_execute = test_db.execute_sql
+        def counting_execute(sql, *args, **kwargs):
+            executed.append(sql)
+            return original_execute(sql, *args, **kwargs)
+        test_db.execute_sql = counting_execute
+        try:
+            stats = Expense.create_many(rows)
+        finally:
+            del test_db.execute_sql
+
+        self.assertEqual(stats["created"], 1501)
+        self.assertEqual([index for index, _ in stats["errors"]], [1500, 1501, 1502])
+        self.assertIn("Nie ma takiej", stats["errors"][0][1])
+        self.assertEqual(len([sql for sql in executed if sql.startswith('INSERT INTO "expense"')]), 2)
+        self.assertEqual(len([sql for sql in executed if 'FROM "category"' in sql]), 1)
+
+        summary = {(s.year_month, s.category.name): (s.total, s.count) for s in ExpenseMonthlySummary.select()}
+        self.assertEqual(summary[("2024-05", "Jedzenie")], (15000.0, 1500))
+        self.assertEqual(summary[("2024-06", "Zakupy")], (2.5, 1))
+        self.assertEqual(Expense.create_many([]), {"created": 0, "errors": []})
+
+    # TC17: Tworzenie wielu wydatków zaokrągla kwoty jak create_expense (połówki grosza od zera)
+    def test_create_many_rounding(self):
+        Category.create_category("Jedzenie")
+        stats = Expense.create_many([
+            {"amount": 1.005, "category": "Jedzenie", "date": date(2024, 5, 3)},
+            {"amount": "0.285", "category": "Jedzenie", "date": date(2024, 5, 3)},
+        ])
+        self.assertEqual(stats["created"], 2)
+        single = Expense.create_expense(1.005, "Jedzenie", date(2024, 5, 4))
+        amounts = [e.amount for e in Expense.select().where(Expense.id != self.test_expense.id).order_by(Expense.id)]
+        self.assertEqual(amounts, [1.01, 0.29, 1.01])
+        self.assertEqual(Expense.get_by_id(single.id).amount, 1.01)
+        summary = ExpenseMonthlySummary.get(ExpenseMonthlySummary.category == Category.get(Category.name == "Jedzenie"))
+        self.assertEqual((summary.total, summary.count), (2.31, 3))
+
+    # TC18: W Postgresie zmiana wydatków to jedno zapytanie: blokada, stare wartości i nowe wiersze naraz
+    def test_update_returning_old_postgres(self):
+        with PostgresqlDatabase("budget").bind_ctx([Category, Expense]):
+            sql, params = Expense.update_returning_old([1, 2], {"amount": 5.0}).sql()
+        self.assertTrue(sql.startswith('UPDATE "expense" SET "amount" = %s FROM (SELECT'))
+        self.assertIn('FOR UPDATE) AS "old"', sql)
+        self.assertIn('WHERE ("expense"."id" = "old"."id") RETURNING', sql)
+        self.assertIn('"old"."amount" AS "old_amount"', sql)
+        self.assertEqual(params, [500, 1, 2])
+
+    # TC19: Przypisanie nazwy kategorii nie tworzy kategorii - nazwę zamieniamy na kategorię jawnie
+    def test_category_name_does_not_create_category(self):
+        Expense(amount=5.0, category="Nieistniejaca", date=date(2024, 5, 1))
+        self.assertIsNone(Category.get_or_none(Category.name == "Nieistniejaca"))
+        self.assertEqual(Expense.page(category="Nieistniejaca"), ([], False))
+        self.assertIsNone(Category.get_or_none(Category.name == "Nieistniejaca"))
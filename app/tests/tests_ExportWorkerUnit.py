@@ -0,0 +1,60 @@
+import os
+os.environ['TEST_MODE'] = 'True'
+
+import threading
+import unittest
+from unittest.mock import patch
+from app.export_worker import ExportWorker
+
+
+class TestExportWorkerUnit(unittest.TestCase):
+    # Testują łączenie próśb o eksport w wątku w tle (bez bazy - eksport jest zamockowany)
+
+    def setUp(self):
+        self.exported = []
+        self.export_called = threading.Event()
+
+        def fake_export():
+            self.exported.append(threading.current_thread().name)
+            self.export_called.set()
+
+        self.worker = ExportWorker(export_func=fake_export, debounce=0.2, max_delay=5.0)
+
+    # TC1: Seria próśb kończy się jednym eksportem
+    def test_burst_is_coalesced(self):
+        for _ in range(5):
+            self.worker.request_export()
+
+        self.assertTrue(self.worker.wait_idle(timeout=5))
+        self.assertEqual(len(self.exported), 1)
+        # Eksport wykonał wątek w tle, a nie wątek zgłaszający
+        self.assertEqual(self.exported[0], "export-worker")
+
+    # TC2: Prośby rozdzielone przerwą dłuższą niż debounce dają osobne eksporty
+    def test_separate_requests_export_twice(self):
+        self.worker.request_export()
+        self.assertTrue(self.worker.wait_idle(timeout=5))
+        self.worker.request_export()
+        self.assertTrue(self.worker.wait_idle(timeout=5))
+        self.assertEqual(self.worker.export_count, 2)
+
+    # TC3: Błąd eksportu nie zatrzymuje wątku
+    def test_export_error_does_not_stop_worker(self):
+        calls = []
+
+        def failing_export():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("Test error")
+
+        worker = ExportWorker(export_func=failing_export, debounce=0.05)
+        with patch('app.export_worker.logger'):
+            worker.request_export()
+            self.assertTrue(worker.wait_idle(timeout=5))
+            worker.request_export()
+            self.assertTrue(worker.wait_idle(timeout=5))
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
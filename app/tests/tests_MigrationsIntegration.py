@@ -0,0 +1,89 @@
+import os
+os.environ['TEST_MODE'] = 'True'
+
+import unittest
+from unittest.mock import patch
+from peewee import SqliteDatabase
+import app.migrations as migrations
+from app.models import Category, Expense, ImportManifest, ExpenseMonthlySummary
+
+MODELS = [Expense, Category, ImportManifest, ExpenseMonthlySummary]
+
+
+class TestMigrationsIntegration(unittest.TestCase):
+
+    def setUp(self):
+        # Każdy test na świeżej bazie w pamięci
+        self.test_db = SqliteDatabase(":memory:")
+        self.test_db.connect()
+
+    def tearDown(self):
+        migrations._migrated.discard(id(self.test_db))
+        self.test_db.close()
+
+    # TC1: Pusta baza - wszystkie migracje, tabele, indeksy i wpisy w schema_version
+    def test_migrate_empty_database(self):
+        applied = migrations.migrate(self.test_db, MODELS)
+
+        self.assertEqual(applied, len(migrations.MIGRATIONS))
+        self.assertEqual(migrations.current_version(self.test_db), migrations.MIGRATIONS[-1][0])
+        tables = self.test_db.get_tables()
+        for table in ["expense", "category", "expense_monthly_summary", "schema_version"]:
+            self.assertIn(table, tables)
+        indexes = {tuple(i.columns) for i in self.test_db.get_indexes("expense")}
+        self.assertIn(("date", "id"), indexes)
+        self.assertIn(("category_id", "date"), indexes)
+
+    # TC2: Ponowne uruchomienie nie stosuje migracji drugi raz (także po nowym procesie)
+    def test_migrate_is_idempotent(self):
+        migrations.migrate(self.test_db, MODELS)
+        self.assertEqual(migrations.migrate(self.test_db, MODELS), 0)
+
+        migrations._migrated.discard(id(self.test_db))
+        self.assertEqual(migrations.migrate(self.test_db, MODELS), 0)
+
+    # TC3: Istniejąca baza sprzed migracji (kategoria jako tekst w expense) - kategorie są przepisywane na id,
+    # brakujące kategorie dodawane, a indeksy i podsumowanie tworzone
+    def test_migrate_existing_database(self):
+        V1Expense, V1Category = migrations.V1Expense, migrations.V1Category
+        with self.test_db.bind_ctx([V1Expense, V1Category]):
+            self.test_db.create_tables([V1Expense, V1Category])
+            V1Category.insert(name="Jedzenie", color="#FFFFFF").execute()
+            V1Expense.insert_many([
+                {"amount": 10.0, "category": "Jedzenie", "date": "2024-05-01"},
+                {"amount": 1.005, "category": "Kino", "date": "2024-05-02"},
+            ]).execute()
+
+        migrations.migrate(self.test_db, MODELS)
+
+        with self.test_db.bind_ctx(MODELS):
+            self.assertEqual(sorted(c.name for c in Category.select()), ["Jedzenie", "Kino"])
+            self.assertEqual([e.category.name for e in Expense.select().order_by(Expense.id)], ["Jedzenie", "Kino"])
+            self.assertEqual(ExpenseMonthlySummary.select().count(), 2)
+            # Kwoty przeliczone na grosze (połówki od zera, jak to_grosze) - w modelu nadal złote
+            self.assertEqual([e.amount for e in Expense.select().order_by(Expense.id)], [10.0, 1.01])
+        self.assertEqual(self.test_db.execute_sql("SELECT SUM(amount) FROM expense").fetchone()[0], 1101)
+        columns = [c.name for c in self.test_db.get_columns("expense")]
+        self.assertNotIn("category", columns)
+        indexes = {tuple(i.columns) for i in self.test_db.get_indexes("expense")}
+        self.assertIn(("category_id", "date"), indexes)
+
+    # TC4: Migracje do wersji 4 nie korzystają z bieżących modeli - podsumowanie w złotych z zamrożonego schematu
+    def test_migrate_to_version_4_without_models(self):
+        V1Expense = migrations.V1Expense
+        with self.test_db.bind_ctx([V1Expense, migrations.V1Category]):
+            self.test_db.create_tables([V1Expense, migrations.V1Category])
+            V1Expense.insert_many([
+                {"amount": 10.25, "category": "Jedzenie", "date": "2024-05-01"},
+                {"amount": 5.5, "category": "Jedzenie", "date": "2024-05-02"},
+            ]).execute()
+
+        with patch.object(migrations, "MIGRATIONS", migrations.MIGRATIONS[:4]):
+            self.assertEqual(migrations.migrate(self.test_db, []), 4)
+
+        self.assertEqual(self.test_db.execute_sql("SELECT name FROM category").fetchall(), [("Jedzenie",)])
+        self.assertEqual(self.test_db.execute_sql("SELECT year_month, sum, count FROM expense_monthly_summary").fetchall(),
+                         [("2024-05", 15.75, 2)])
+
+if __name__ == "__main__":
+    unittest.main()
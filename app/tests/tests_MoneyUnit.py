@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+from decimal import Decimal
+from app.money import to_grosze, to_zloty, series_to_grosze
+
+
+class TestMoney(unittest.TestCase):
+
+    # TC1: Złote -> grosze bez błędów reprezentacji floatów
+    def test_to_grosze(self):
+        self.assertEqual(to_grosze(0.29), 29)
+        self.assertEqual(to_grosze(100), 10000)
+        self.assertEqual(to_grosze("12.345"), 1235)
+        self.assertEqual(to_grosze(Decimal("-7.10")), -710)
+
+    # TC2: Grosze -> złote, także dla Decimal zwracanego przez SUM w Postgresie
+    def test_to_zloty(self):
+        self.assertEqual(to_zloty(1999), 19.99)
+        self.assertEqual(to_zloty(Decimal(250)), 2.5)
+
+    # TC3: Suma wielu kwot na groszach jest dokładna (na floatach 0.1 + 0.2 != 0.3)
+    def test_series_to_grosze_sum_is_exact(self):
+        grosze = series_to_grosze([0.1, 0.2] * 1000)
+        self.assertEqual(grosze.dtype, np.int64)
+        self.assertEqual(grosze.sum(), 30000)
+        self.assertEqual(to_zloty(grosze.sum()), 300.0)
+
+    # TC4: Kolumna zaokrąglana tak samo jak pojedyncza kwota (połówki od zera, bez błędu floatu)
+    def test_series_to_grosze_matches_to_grosze(self):
+        values = [1.005, 0.285, -1.005, 12.345, 0.29]
+        self.assertEqual(series_to_grosze(values).tolist(), [101, 29, -101, 1235, 29])
+        self.assertEqual(series_to_grosze(values).tolist(), [to_grosze(v) for v in values])
+        # Losowe kwoty z groszami i połówkami groszy - wynik wektorowy taki sam jak pojedynczo
+        amounts = np.round(np.random.default_rng(0).uniform(-10000, 10000, 5000), 3)
+        self.assertEqual(series_to_grosze(amounts).tolist(), [to_grosze(v) for v in amounts.tolist()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import re
+import unittest
+from app.palette import PALETTE, ColorAllocator, fallback_color
+from app.colors import PASTEL_COLORS
+
+
+class TestPalette(unittest.TestCase):
+
+    # TC1: Paleta - kolory '#RRGGBB', pastelowe (kanały 128-255), bez powtórzeń i bez kolorów z PASTEL_COLORS
+    def test_palette(self):
+        self.assertEqual(len(PALETTE), len(set(PALETTE)))
+        self.assertFalse(set(PALETTE) & set(PASTEL_COLORS.values()))
+        for color in PALETTE:
+            self.assertRegex(color, r"^#[0-9A-F]{6}$")
+            self.assertTrue(all(int(color[i:i + 2], 16) >= 128 for i in (1, 3, 5)))
+
+    # TC2: Przydział pomija zajęte kolory i jest deterministyczny
+    def test_allocate_skips_used(self):
+        allocator = ColorAllocator([PALETTE[0], PALETTE[2]])
+        self.assertEqual(allocator.allocate_many(2), [PALETTE[1], PALETTE[3]])
+        self.assertFalse(allocator.reserve(PALETTE[1]))
+        self.assertTrue(allocator.reserve("#ABCDEF"))
+        self.assertEqual(ColorAllocator().allocate_many(5), PALETTE[:5])
+
+    # TC3: Po wyczerpaniu palety kolory pochodzą z zapasu awaryjnego, nadal unikalne i w formacie '#RRGGBB'
+    def test_fallback_after_palette(self):
+        colors = ColorAllocator().allocate_many(len(PALETTE) + 50)
+        self.assertEqual(len(colors), len(set(colors)))
+        self.assertEqual(colors[len(PALETTE)], fallback_color(0))
+        self.assertTrue(all(re.match(r"^#[0-9A-F]{6}$", c) for c in colors[len(PALETTE):]))
+        self.assertFalse(set(colors) & set(PASTEL_COLORS.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()